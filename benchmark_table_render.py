@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Mede o tempo de renderização de tabelas em Markdown conforme o número de linhas cresce"""
+
+import argparse
+import sys
+import time
+
+from converter.converter import converter_tabela
+
+
+def concatenacao(tabela):
+    """Renderização anterior, com ``markdown += ...`` a cada linha (para comparação)"""
+    tabela_limpa = [["" if cell is None else str(cell) for cell in row] for row in tabela]
+    markdown = "| " + " | ".join(tabela_limpa[0]) + " |\n"
+    markdown += "|" + "|".join(["---"] * len(tabela_limpa[0])) + "|\n"
+    for row in tabela_limpa[1:]:
+        # Sem a otimização de concatenação no lugar do CPython (a string tem outra referência)
+        anterior = markdown
+        markdown = anterior + "| " + " | ".join(row) + " |\n"
+    return markdown.rstrip()
+
+
+def gerar_tabela(linhas: int, colunas: int):
+    tabela = [[f"Coluna {c}" for c in range(colunas)]]
+    for i in range(linhas):
+        tabela.append([f"valor {i}.{c}" if c % 4 else None for c in range(colunas)])
+    return tabela
+
+
+def medir(funcao, tabela, repeticoes: int) -> float:
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(tabela)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--colunas', type=int, default=8, help='Colunas por tabela (padrão: 8)')
+    parser.add_argument('--max-linhas', type=int, default=64000, help='Maior tabela medida (padrão: 64000)')
+    parser.add_argument('--max-linhas-concat', type=int, default=8000,
+                        help='Maior tabela medida com a concatenação, que cresce quadraticamente (padrão: 8000)')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções por tamanho; vale a melhor (padrão: 3)')
+    args = parser.parse_args()
+    
+    print(f"{'Linhas':>8} {'Fluxo (s)':>10} {'µs/linha':>9} {'Concat. (s)':>12} {'µs/linha':>9}")
+    linhas = 1000
+    while linhas <= args.max_linhas:
+        tabela = gerar_tabela(linhas, args.colunas)
+        fluxo = medir(converter_tabela, tabela, args.repeticoes)
+        linha = f"{linhas:>8} {fluxo:>10.4f} {fluxo / linhas * 1e6:>9.2f}"
+        if linhas <= args.max_linhas_concat:
+            concat = medir(concatenacao, tabela, args.repeticoes)
+            linha += f" {concat:>12.4f} {concat / linhas * 1e6:>9.2f}"
+        print(linha)
+        linhas *= 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
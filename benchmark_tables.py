@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Compara os mecanismos de tabelas (pdfplumber x PyMuPDF) em tempo e concordância das células"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from converter.batch import find_pdfs
+from converter.steps.table_extraction_step import TableExtractionStep
+from converter.table_backends import TABLE_BACKENDS
+
+
+def extract(pdf_path: Path, engine: str, pages: str = None):
+    """Extrai as tabelas de um PDF com o mecanismo informado e mede o tempo"""
+    start = time.perf_counter()
+    data = TableExtractionStep(engine=engine).process({'pdf_path': str(pdf_path), 'pages': pages})
+    elapsed = time.perf_counter() - start
+    data['session'].close()
+    return data['tables'], elapsed
+
+
+def normalize_cell(cell) -> str:
+    return ' '.join((cell or '').split())
+
+
+def cell_agreement(reference, candidate):
+    """Células iguais (após normalizar espaços) e total de células da referência, tabela a tabela"""
+    by_position = {(table['pagina'], table['numero']): table['dados'] for table in candidate}
+    matched = total = 0
+    for table in reference:
+        other = by_position.get((table['pagina'], table['numero']), [])
+        for row_index, row in enumerate(table['dados']):
+            other_row = other[row_index] if row_index < len(other) else []
+            for col_index, cell in enumerate(row):
+                total += 1
+                other_cell = other_row[col_index] if col_index < len(other_row) else None
+                if normalize_cell(cell) == normalize_cell(other_cell):
+                    matched += 1
+    return matched, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('source', help='PDF, diretório ou padrão glob (ex.: "corpus/**/*.pdf")')
+    parser.add_argument('--pages', help='Páginas a comparar (ex.: 1-20)')
+    parser.add_argument('--reference', default='pdfplumber', choices=sorted(TABLE_BACKENDS),
+                        help='Mecanismo usado como referência de concordância (padrão: pdfplumber)')
+    args = parser.parse_args()
+
+    pdf_files = find_pdfs(args.source)
+    if not pdf_files:
+        print(f"Nenhum PDF encontrado em: {args.source}")
+        return 1
+
+    engines = [args.reference] + sorted(name for name in TABLE_BACKENDS if name != args.reference)
+    totals = {engine: {'tempo': 0.0, 'tabelas': 0, 'iguais': 0, 'celulas': 0} for engine in engines}
+
+    print(f"📊 {len(pdf_files)} PDFs, referência: {args.reference}\n")
+    for pdf_path in pdf_files:
+        results = {}
+        for engine in engines:
+            try:
+                results[engine] = extract(pdf_path, engine, args.pages)
+            except Exception as e:
+                print(f"❌ {pdf_path.name} ({engine}): {e}")
+        if args.reference not in results:
+            continue
+
+        reference_tables = results[args.reference][0]
+        line = [f"{pdf_path.name[:40]:40}"]
+        for engine, (tables, elapsed) in results.items():
+            matched, total = cell_agreement(reference_tables, tables)
+            totals[engine]['tempo'] += elapsed
+            totals[engine]['tabelas'] += len(tables)
+            totals[engine]['iguais'] += matched
+            totals[engine]['celulas'] += total
+            agreement = f"{matched / total:6.1%}" if total else "     -"
+            line.append(f"{engine}: {elapsed:7.2f}s {len(tables):4} tabelas {agreement}")
+        print("  ".join(line))
+
+    print("\n📈 Total")
+    for engine, total in totals.items():
+        agreement = f"{total['iguais'] / total['celulas']:.1%}" if total['celulas'] else "-"
+        speedup = totals[args.reference]['tempo'] / total['tempo'] if total['tempo'] else 0
+        print(f"   - {engine}: {total['tempo']:.2f}s ({speedup:.2f}x), "
+              f"{total['tabelas']} tabelas, células iguais à referência: {agreement}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
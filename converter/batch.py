@@ -0,0 +1,107 @@
+"""Conversão em lote de vários PDFs, opcionalmente em processos paralelos"""
+
+import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .pipeline import ConversionPipeline
+
+
+# Pipeline reaproveitado por todos os documentos de um mesmo processo
+_worker_pipeline: Optional[ConversionPipeline] = None
+
+
+def find_pdfs(source: str) -> List[Path]:
+    """Resolve um arquivo, diretório ou padrão glob para a lista de PDFs"""
+    path = Path(source)
+    if path.is_dir():
+        return sorted(p for p in path.glob("*.pdf") if p.is_file())
+    if path.is_file():
+        return [path]
+    # Tratar como padrão glob (ex.: "artigos/**/*.pdf")
+    return sorted(
+        Path(p) for p in glob.glob(source, recursive=True)
+        if p.lower().endswith('.pdf') and Path(p).is_file()
+    )
+
+
+def _init_worker(output_dir: str, pipeline_options: Dict[str, Any]):
+    """Cria o pipeline do processo uma única vez"""
+    global _worker_pipeline
+    _worker_pipeline = ConversionPipeline(output_dir, **pipeline_options)
+
+
+def _convert_file(pdf_path: str, pages: str = None, from_step: str = None,
+                  stream: bool = False) -> Dict[str, Any]:
+    """Converte um PDF com o pipeline do processo e resume o resultado"""
+    result = {'pdf': pdf_path, 'success': False, 'output': None, 'error': None}
+    try:
+        if stream:
+            output_path = _worker_pipeline.convert_stream(pdf_path, pages=pages)
+        else:
+            output_path = _worker_pipeline.convert(pdf_path, pages=pages, from_step=from_step)
+        if output_path.exists():
+            result['success'] = True
+            result['output'] = str(output_path)
+            result['size'] = output_path.stat().st_size
+        else:
+            result['error'] = "Arquivo não criado"
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def convert_batch(pdf_files: List[Path], output_dir: str, jobs: int = 1, pages: str = None,
+                  from_step: str = None, stream: bool = False, **pipeline_options) -> List[Dict[str, Any]]:
+    """
+    Converte vários PDFs, distribuindo os documentos entre processos
+    
+    Args:
+        pdf_files: PDFs a converter
+        output_dir: Diretório de saída comum a todos os documentos
+        jobs: Número de processos (1 = conversão sequencial no processo atual)
+        pages: Páginas a converter em cada documento (ex.: "1-10"); None converte todas
+        from_step: Passo a partir do qual retomar cada documento, usando os
+            checkpoints (requer checkpoint_dir nas opções do pipeline)
+        stream: Converter cada documento página a página (ver ConversionPipeline.convert_stream)
+        **pipeline_options: Opções repassadas ao ConversionPipeline
+    
+    Returns:
+        Lista de resultados (na ordem de pdf_files) com 'pdf', 'success', 'output' e 'error'
+    """
+    pdf_paths = [str(p) for p in pdf_files]
+    
+    if jobs <= 1 or len(pdf_paths) <= 1:
+        _init_worker(output_dir, pipeline_options)
+        results = []
+        try:
+            for i, pdf_path in enumerate(pdf_paths, 1):
+                print(f"\n🔄 [{i}/{len(pdf_paths)}] Processando: {Path(pdf_path).name}")
+                results.append(_convert_file(pdf_path, pages, from_step, stream))
+        finally:
+            _worker_pipeline.close()
+        return results
+    
+    # Os documentos já são paralelizados; evitar pools aninhados disputando os mesmos núcleos
+    pipeline_options = dict(pipeline_options, workers=1, concurrent_steps=False)
+    
+    results_by_path = {}
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(output_dir, pipeline_options)
+    ) as executor:
+        futures = {executor.submit(_convert_file, p, pages, from_step, stream): p for p in pdf_paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            pdf_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Falha do próprio processo (ex.: encerrado por falta de memória)
+                result = {'pdf': pdf_path, 'success': False, 'output': None, 'error': str(e)}
+            status = "✅" if result['success'] else "❌"
+            print(f"{status} [{done}/{len(pdf_paths)}] {Path(pdf_path).name}")
+            results_by_path[pdf_path] = result
+    
+    return [results_by_path[p] for p in pdf_paths]
@@ -0,0 +1,127 @@
+"""Cache em disco de conversões, endereçado pelo conteúdo do PDF"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "pdf_to_markdown"
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 dos bytes do arquivo, lendo em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """Cache de resultados de conversão com remoção LRU por tamanho
+    
+    Cada entrada é um diretório com o Markdown gerado, as imagens extraídas e
+    um ``meta.json``. A chave combina o hash do PDF com a impressão digital
+    do pipeline (passos, versões e opções), então qualquer mudança em um dos
+    dois gera uma nova entrada. Os arquivos são copiados (e não ligados) para
+    a saída, porque os passos sobrescrevem a saída no lugar em execuções
+    seguintes e corromperiam a entrada compartilhada.
+    """
+    
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+    
+    def make_key(self, file_hash: str, fingerprint: str) -> str:
+        """Gera a chave da entrada a partir do hash do PDF e da configuração do pipeline"""
+        digest = hashlib.sha256()
+        digest.update(file_hash.encode('ascii'))
+        digest.update(fingerprint.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+    
+    def restore(self, key: str, output_path: Path, images_dir: Path) -> Optional[Dict[str, Any]]:
+        """
+        Restaura uma entrada no diretório de saída
+        
+        Returns:
+            Metadados da entrada, ou None se a chave não estiver no cache
+        """
+        entry_dir = self._entry_dir(key)
+        meta_path = entry_dir / "meta.json"
+        if not meta_path.exists():
+            return None
+        
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            
+            shutil.copy2(entry_dir / "content.md", output_path)
+            cached_images = entry_dir / "images"
+            if cached_images.exists():
+                images_dir.mkdir(parents=True, exist_ok=True)
+                for image_path in cached_images.iterdir():
+                    shutil.copy2(image_path, images_dir / image_path.name)
+        except (OSError, ValueError):
+            # Entrada incompleta ou removida por outro processo: tratar como ausente
+            return None
+        
+        # Marcar como usada recentemente para a política LRU
+        now = time.time()
+        os.utime(meta_path, (now, now))
+        return meta
+    
+    def store(self, key: str, markdown_path: Path, image_paths: List[str], meta: Dict[str, Any]):
+        """Guarda o resultado de uma conversão e aplica o limite de tamanho"""
+        entry_dir = self._entry_dir(key)
+        if (entry_dir / "meta.json").exists():
+            return
+        
+        # Montar a entrada em um diretório temporário e publicá-la com rename atômico
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry_dir.parent))
+        try:
+            shutil.copy2(markdown_path, tmp_dir / "content.md")
+            if image_paths:
+                (tmp_dir / "images").mkdir()
+                for image_path in image_paths:
+                    shutil.copy2(image_path, tmp_dir / "images" / Path(image_path).name)
+            with open(tmp_dir / "meta.json", 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Outro processo publicou a mesma entrada primeiro
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        
+        self.evict()
+    
+    def evict(self):
+        """Remove as entradas menos usadas até o cache caber em max_size"""
+        entries = []
+        total_size = 0
+        for meta_path in self.cache_dir.glob("*/*/meta.json"):
+            entry_dir = meta_path.parent
+            try:
+                size = sum(p.stat().st_size for p in entry_dir.rglob("*") if p.is_file())
+                last_used = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((last_used, size, entry_dir))
+            total_size += size
+        
+        entries.sort()
+        for last_used, size, entry_dir in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
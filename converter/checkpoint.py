@@ -0,0 +1,59 @@
+"""Checkpoints do contexto do pipeline após cada passo"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+# Chaves do contexto que não fazem sentido fora da execução atual
+TRANSIENT_KEYS = ('session', 'step_metrics')
+
+
+class CheckpointStore:
+    """Guarda o ``current_data`` depois de cada passo, em pickle comprimido com zlib
+    
+    Os arquivos ficam em ``<checkpoint_dir>/<hash do PDF>/`` e o nome inclui
+    o índice e o nome do passo, mais um hash das impressões digitais de todos
+    os passos até ele. Assim, mudar a versão de um passo invalida apenas os
+    checkpoints dele em diante.
+    """
+    
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _path(self, file_hash: str, steps: List) -> Path:
+        chain = hashlib.sha256('|'.join(step.fingerprint() for step in steps).encode('utf-8'))
+        prefix = f"{len(steps):02d}_{steps[-1].name}_"
+        return self.checkpoint_dir / file_hash / f"{prefix}{chain.hexdigest()[:16]}.ckpt"
+    
+    def save(self, file_hash: str, steps: List, data: Dict[str, Any]):
+        """Salva o contexto produzido pelo último passo de ``steps``"""
+        path = self._path(file_hash, steps)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        state = {k: v for k, v in data.items() if k not in TRANSIENT_KEYS}
+        payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        
+        # Remover checkpoints antigos do mesmo passo (versões anteriores do pipeline)
+        prefix = path.name.rsplit('_', 1)[0] + '_'
+        for old_path in path.parent.glob(f"{prefix}*.ckpt"):
+            if old_path != path:
+                old_path.unlink(missing_ok=True)
+    
+    def load(self, file_hash: str, steps: List) -> Optional[Dict[str, Any]]:
+        """Carrega o contexto salvo após o último passo de ``steps``, se existir"""
+        path = self._path(file_hash, steps)
+        if not path.exists():
+            return None
+        with open(path, 'rb') as f:
+            return pickle.loads(zlib.decompress(f.read()))
@@ -4,6 +4,9 @@ import re
 from pathlib import Path
 from typing import List, Dict, Any
 
+from .font_profile import FontProfile
+from .table_renderer import render_table
+
 
 def converter_texto(texto_pdf: str) -> str:
     """Converte texto extraído do PDF para Markdown"""
@@ -13,36 +16,24 @@ def converter_texto(texto_pdf: str) -> str:
     return texto_pdf
 
 
-def converter_tabela(tabela_pdf: List[List[str]]) -> str:
-    """Converte tabela extraída do PDF para Markdown"""
+def converter_tabela(tabela_pdf: List[List[str]], max_linhas: int = None,
+                     linhas_por_pagina: int = None) -> str:
+    """Converte tabela extraída do PDF para Markdown
+    
+    Args:
+        tabela_pdf: Linhas da tabela (a primeira é o cabeçalho)
+        max_linhas: Máximo de linhas de dados; as demais são omitidas com uma nota
+        linhas_por_pagina: Divide tabelas grandes em partes com o cabeçalho repetido
+    """
     # Implementação mínima para fazer o teste passar
     if tabela_pdf == [["Coluna A", "Coluna B"], ["Dado 1", "Dado 2"], ["Dado 3", "Dado 4"]]:
         return "| Coluna A | Coluna B |\n|---|---|\n| Dado 1 | Dado 2 |\n| Dado 3 | Dado 4 |"
     
-    # Implementação genérica
+    # Implementação genérica: linhas geradas uma a uma e unidas uma única vez
     if not tabela_pdf:
         return ""
     
-    # Limpar valores None e converter para string
-    tabela_limpa = []
-    for row in tabela_pdf:
-        row_limpa = []
-        for cell in row:
-            if cell is None:
-                row_limpa.append("")
-            else:
-                row_limpa.append(str(cell))
-        tabela_limpa.append(row_limpa)
-    
-    # Cabeçalho
-    markdown = "| " + " | ".join(tabela_limpa[0]) + " |\n"
-    markdown += "|" + "|".join(["---"] * len(tabela_limpa[0])) + "|\n"
-    
-    # Linhas de dados
-    for row in tabela_limpa[1:]:
-        markdown += "| " + " | ".join(row) + " |\n"
-    
-    return markdown.rstrip()
+    return render_table(tabela_pdf, max_rows=max_linhas, page_rows=linhas_por_pagina)
 
 
 def limpar_texto(texto_pagina: str) -> str:
@@ -84,16 +75,10 @@ def detectar_titulos(dados_fonte: List[Dict[str, Any]]) -> str:
     if len(dados_fonte) == 2 and dados_fonte[0]["texto"] == "Introdução" and dados_fonte[0]["tamanho"] == 16:
         return "# Introdução\n\nEste é um parágrafo"
     
-    # Implementação genérica
+    # Implementação genérica: níveis de título pelo perfil de fontes dos dados
+    perfil = FontProfile.from_sizes((dado["tamanho"], len(dado["texto"])) for dado in dados_fonte)
     resultado = []
     for dado in dados_fonte:
-        texto = dado["texto"]
-        tamanho = dado["tamanho"]
-        
-        # Considera títulos fontes maiores que 14pt
-        if tamanho >= 14:
-            resultado.append(f"# {texto}")
-        else:
-            resultado.append(texto)
+        resultado.append(perfil.heading_prefix(dado["tamanho"]) + dado["texto"])
     
     return "\n\n".join(resultado)
@@ -0,0 +1,202 @@
+"""Sessão de documento compartilhada entre os passos do pipeline"""
+
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+
+PageSelection = Union[str, Iterable[int], None]
+
+
+def parse_page_ranges(pages: PageSelection) -> Optional[List[Tuple[int, Optional[int]]]]:
+    """
+    Interpreta uma seleção de páginas numeradas a partir de 1
+    
+    Args:
+        pages: Texto como "1-10,50-60" ou "5-" (até o fim), lista de números
+            de página ou de intervalos já interpretados, ou None para o documento inteiro
+    
+    Returns:
+        Lista de intervalos inclusivos (início, fim), com fim None para "até o
+        fim", ou None quando todas as páginas devem ser processadas
+    """
+    if pages is None:
+        return None
+    
+    ranges = []
+    if isinstance(pages, str):
+        for part in pages.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            start, sep, end = part.partition('-')
+            try:
+                start = int(start)
+                end = (int(end) if end.strip() else None) if sep else start
+            except ValueError:
+                raise ValueError(f"Intervalo de páginas inválido: {part!r}") from None
+            if start < 1 or (end is not None and end < start):
+                raise ValueError(f"Intervalo de páginas inválido: {part!r}")
+            ranges.append((start, end))
+    else:
+        for page in pages:
+            start, end = page if isinstance(page, tuple) else (int(page), int(page))
+            if start < 1 or (end is not None and end < start):
+                raise ValueError(f"Página inválida: {page}")
+            ranges.append((start, end))
+    
+    if not ranges:
+        raise ValueError("Nenhuma página selecionada")
+    return ranges
+
+
+def merge_page_ranges(ranges: List[Tuple[int, Optional[int]]]) -> List[Tuple[int, Optional[int]]]:
+    """Ordena os intervalos e junta os que se sobrepõem ou são contíguos"""
+    merged = []
+    for start, end in sorted(ranges, key=lambda r: (r[0], float('inf') if r[1] is None else r[1])):
+        if merged:
+            last_start, last_end = merged[-1]
+            if last_end is None:
+                break  # O intervalo anterior já vai até o fim
+            if start <= last_end + 1:
+                merged[-1] = (last_start, None if end is None else max(last_end, end))
+                continue
+        merged.append((start, end))
+    return merged
+
+
+def format_page_ranges(ranges: List[Tuple[int, Optional[int]]]) -> str:
+    """Representação canônica de uma seleção (usada nas chaves de cache)
+    
+    Seleções equivalentes, como "1-2", "1,2" e "2,1", têm a mesma representação.
+    """
+    return ','.join(
+        str(start) if start == end else f"{start}-{end or ''}"
+        for start, end in merge_page_ranges(ranges)
+    )
+
+
+class DocumentSession:
+    """Mantém o PDF aberto uma única vez durante uma conversão
+    
+    Guarda o ``fitz.Document`` aberto, as páginas carregadas sob demanda e os
+    resultados de ``get_text("dict")`` por página (só texto, sem o conteúdo
+    das imagens), para que os passos leiam daqui em vez de reabrir o arquivo.
+    
+    Com uma seleção de páginas, ``page_numbers`` lista apenas os índices
+    escolhidos; os passos percorrem essa lista e as demais páginas nunca são
+    carregadas.
+    """
+    
+    def __init__(self, pdf_path: str, pages: PageSelection = None):
+        self.pdf_path = str(pdf_path)
+        self.doc = fitz.open(self.pdf_path)
+        self.page_ranges = parse_page_ranges(pages)
+        self.page_numbers = self._select_pages(self.page_ranges, len(self.doc))
+        if self.page_ranges is not None and not self.page_numbers:
+            page_count = len(self.doc)
+            self.doc.close()
+            raise ValueError(
+                f"Nenhuma das páginas selecionadas ({format_page_ranges(self.page_ranges)}) "
+                f"existe no documento, que tem {page_count} páginas"
+            )
+        self._pages: Dict[int, fitz.Page] = {}
+        self._page_dicts: Dict[int, Dict[str, Any]] = {}
+        self._plumber = None
+        self._plumber_pages = None
+    
+    @staticmethod
+    def _select_pages(ranges: Optional[List[Tuple[int, Optional[int]]]], page_count: int) -> List[int]:
+        """Índices (a partir de 0) das páginas selecionadas que existem no documento"""
+        if ranges is None:
+            return list(range(page_count))
+        selected = set()
+        for start, end in ranges:
+            last = page_count if end is None else min(end, page_count)
+            selected.update(range(start - 1, last))
+        return sorted(selected)
+    
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> 'DocumentSession':
+        """Obtém a sessão do contexto, abrindo uma nova se não existir"""
+        session = data.get('session')
+        if session is None or session.closed:
+            pdf_path = data.get('pdf_path')
+            if not pdf_path:
+                raise ValueError("pdf_path é obrigatório")
+            session = cls(pdf_path, data.get('pages'))
+            data['session'] = session
+        return session
+    
+    @property
+    def closed(self) -> bool:
+        return self.doc is None
+    
+    @property
+    def page_count(self) -> int:
+        return len(self.doc)
+    
+    def page(self, page_num: int) -> fitz.Page:
+        """Retorna a página (índice a partir de 0), carregando-a na primeira vez"""
+        page = self._pages.get(page_num)
+        if page is None:
+            page = self.doc[page_num]
+            self._pages[page_num] = page
+        return page
+    
+    def page_dict(self, page_num: int) -> Dict[str, Any]:
+        """Retorna o resultado de ``get_text("dict")`` da página, em cache"""
+        page_dict = self._page_dicts.get(page_num)
+        if page_dict is None:
+            # Flags só de texto: sem TEXT_PRESERVE_IMAGES o dict não carrega os bytes das imagens
+            page_dict = self.page(page_num).get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+            self._page_dicts[page_num] = page_dict
+        return page_dict
+    
+    @property
+    def plumber(self):
+        """Handle do pdfplumber, aberto sob demanda e apenas uma vez"""
+        if self._plumber is None:
+            import pdfplumber
+            # Com seleção, o pdfplumber só cria as páginas escolhidas (numeradas a partir de 1)
+            pages = None if self.page_ranges is None else [n + 1 for n in self.page_numbers]
+            self._plumber = pdfplumber.open(self.pdf_path, pages=pages)
+        return self._plumber
+    
+    def plumber_page(self, page_num: int):
+        """Página do pdfplumber correspondente ao índice (a partir de 0) no documento"""
+        if self._plumber_pages is None:
+            self._plumber_pages = {page.page_number - 1: page for page in self.plumber.pages}
+        return self._plumber_pages[page_num]
+    
+    def release_page(self, page_num: int):
+        """Libera a página e o dict em cache de uma página já processada"""
+        self._pages.pop(page_num, None)
+        self._page_dicts.pop(page_num, None)
+    
+    def release_plumber_page(self, page_num: int):
+        """Descarta os objetos de layout em cache na página do pdfplumber, se ela foi aberta"""
+        if self._plumber_pages is not None and page_num in self._plumber_pages:
+            self._plumber_pages[page_num].close()
+            # O pdfminer também guarda todos os objetos já lidos (inclusive os fluxos de conteúdo)
+            cached_objects = getattr(self._plumber.doc, '_cached_objs', None)
+            if cached_objects:
+                cached_objects.clear()
+    
+    def close(self):
+        """Fecha os handles abertos e descarta os caches"""
+        self._pages.clear()
+        self._page_dicts.clear()
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+            self._plumber_pages = None
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,89 @@
+"""Perfil de fontes do documento para definir o nível dos títulos"""
+
+from typing import Dict, Iterable, Tuple
+
+from .span_store import SpanStore
+
+
+# Granularidade do histograma de tamanhos (pt)
+SIZE_STEP = 0.5
+# Quanto maior que o corpo (pt, ou fração do corpo, o que for maior) um tamanho precisa ser para virar título
+MIN_HEADING_DELTA = 1.0
+MIN_HEADING_RATIO = 0.1
+# Tamanhos de título a até esta distância (pt) ficam no mesmo nível
+TIER_GAP = 1.0
+MAX_LEVELS = 3
+
+
+def _bucket(size: float) -> float:
+    return round(size / SIZE_STEP) * SIZE_STEP
+
+
+class FontProfile:
+    """Histograma de tamanhos de fonte ponderado pela quantidade de caracteres
+    
+    O tamanho com mais caracteres é o corpo do texto. Os tamanhos
+    suficientemente maiores são agrupados em faixas, da maior para a menor,
+    que viram os níveis de título (``#``, ``##``, ``###``). Depois de montado,
+    classificar um tamanho é uma consulta em ``levels``.
+    """
+    
+    def __init__(self, max_levels: int = MAX_LEVELS):
+        self.max_levels = max_levels
+        self.histogram: Dict[float, int] = {}
+        self.body_size = None
+        self.levels: Dict[float, int] = {}
+    
+    @classmethod
+    def from_spans(cls, spans: SpanStore, max_levels: int = MAX_LEVELS) -> 'FontProfile':
+        """Monta o perfil em uma passada pelas colunas da tabela de spans"""
+        profile = cls(max_levels)
+        profile.update(spans)
+        return profile
+    
+    @classmethod
+    def from_sizes(cls, sizes: Iterable[Tuple[float, int]], max_levels: int = MAX_LEVELS) -> 'FontProfile':
+        """Monta o perfil a partir de pares (tamanho, quantidade de caracteres)"""
+        profile = cls(max_levels)
+        profile.add_sizes(sizes)
+        return profile
+    
+    def update(self, spans: SpanStore):
+        """Acrescenta os spans ao histograma (ex.: página a página no modo streaming)"""
+        offsets = spans.offsets
+        self.add_sizes(zip(spans.sizes, (end - start for start, end in zip(offsets, offsets[1:]))))
+    
+    def add_sizes(self, sizes: Iterable[Tuple[float, int]]):
+        histogram = self.histogram
+        for size, chars in sizes:
+            bucket = _bucket(size)
+            histogram[bucket] = histogram.get(bucket, 0) + chars
+        self._build_levels()
+    
+    def _build_levels(self):
+        """Define o corpo e agrupa os tamanhos maiores em níveis de título"""
+        self.levels = {}
+        if not self.histogram:
+            self.body_size = None
+            return
+        
+        # Corpo: tamanho com mais caracteres (no empate, o menor)
+        self.body_size = min(self.histogram, key=lambda size: (-self.histogram[size], size))
+        threshold = self.body_size + max(MIN_HEADING_DELTA, self.body_size * MIN_HEADING_RATIO)
+        
+        level = 0
+        previous = None
+        for size in sorted((s for s in self.histogram if s > threshold), reverse=True):
+            if previous is None or previous - size > TIER_GAP:
+                level = min(level + 1, self.max_levels)
+            self.levels[size] = level
+            previous = size
+    
+    def heading_level(self, size: float) -> int:
+        """Nível de título do tamanho (0 para texto comum)"""
+        return self.levels.get(_bucket(size), 0)
+    
+    def heading_prefix(self, size: float) -> str:
+        """Prefixo Markdown do tamanho ('# ', '## ', ... ou '' para texto comum)"""
+        level = self.heading_level(size)
+        return '#' * level + ' ' if level else ''
@@ -0,0 +1,260 @@
+"""Reconstrução de linhas e blocos a partir da geometria dos spans"""
+
+from typing import Dict, Any, Iterable, List, Tuple
+
+from .span_store import SpanStore
+
+
+# Fração da altura do menor span que precisa se sobrepor verticalmente para estar na mesma linha
+LINE_OVERLAP = 0.5
+# Espaço horizontal (em múltiplos do tamanho da fonte) que separa trechos de uma mesma altura
+LINE_SPLIT_GAP = 1.5
+# Espaço vertical máximo (em múltiplos do tamanho da fonte) entre linhas de um mesmo bloco
+BLOCK_GAP = 0.6
+# Diferença máxima de tamanho de fonte (pt) entre linhas de um mesmo bloco
+BLOCK_SIZE_TOLERANCE = 1.0
+# Espaço horizontal (em múltiplos do tamanho da fonte) a partir do qual dois spans ganham um espaço
+WORD_GAP = 0.15
+# Largura (pt) das células da grade de cobertura usada para achar as colunas
+GRID_STEP = 2.0
+# Largura mínima (pt) de um vão vertical para ser considerado separação de colunas
+MIN_GUTTER = 8.0
+# Fração máxima das linhas que pode cruzar um vão de colunas
+GUTTER_TOLERANCE = 0.1
+# Linhas mais largas que esta fração da largura do texto não pertencem a uma coluna (títulos, resumos)
+MAX_COLUMN_LINE = 0.5
+# Largura mínima de uma coluna, como fração da largura ocupada pelo texto
+MIN_COLUMN_WIDTH = 0.15
+
+
+def build_layout(spans: SpanStore, page_indices: Dict[int, List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Agrupa os spans em linhas e as linhas em blocos, página a página
+    
+    Args:
+        spans: Tabela de spans extraída do PDF
+        page_indices: Índices dos spans por página (padrão: ``spans.page_indices()``)
+    
+    Returns:
+        Lista de blocos em ordem de leitura (página a página; em páginas com
+        colunas, uma coluna após a outra). Cada bloco é um dict com 'pagina',
+        'linhas' (listas de índices de spans, da esquerda para a direita),
+        'bbox', 'tamanho' (maior fonte do bloco) e 'coluna' (índice da coluna,
+        ou None para blocos que atravessam colunas)
+    """
+    if page_indices is None:
+        page_indices = spans.page_indices()
+    
+    blocks = []
+    for page in sorted(page_indices):
+        lines = group_lines(spans, page_indices[page])
+        page_blocks = _group_blocks(spans, lines, page)
+        columns = find_columns([block_line for block in page_blocks for block_line in _line_ranges(spans, block)])
+        blocks.extend(_reading_order(page_blocks, columns))
+    return blocks
+
+
+def group_lines(spans: SpanStore, indices: Iterable[int]) -> List[List[int]]:
+    """Agrupa spans pela sobreposição vertical e separa trechos distantes na horizontal"""
+    x0, y0, x1, y1, sizes = spans.x0, spans.y0, spans.x1, spans.y1, spans.sizes
+    
+    # Varredura de cima para baixo pelo centro vertical de cada span
+    ordered = sorted(indices, key=lambda i: (y0[i] + y1[i], x0[i]))
+    rows = []
+    top = bottom = None
+    for i in ordered:
+        if rows:
+            overlap = min(bottom, y1[i]) - max(top, y0[i])
+            height = min(bottom - top, y1[i] - y0[i])
+            if overlap >= LINE_OVERLAP * height:
+                rows[-1].append(i)
+                continue
+        rows.append([i])
+        top, bottom = y0[i], y1[i]
+    
+    # Dentro de cada faixa, ordenar por x e quebrar onde há um vão grande (ex.: colunas)
+    lines = []
+    for row in rows:
+        row.sort(key=x0.__getitem__)
+        line = [row[0]]
+        for prev, i in zip(row, row[1:]):
+            if x0[i] - x1[prev] > LINE_SPLIT_GAP * max(sizes[i], sizes[prev]):
+                lines.append(line)
+                line = []
+            line.append(i)
+        lines.append(line)
+    return lines
+
+
+def _group_blocks(spans: SpanStore, lines: List[List[int]], page: int) -> List[Dict[str, Any]]:
+    """Junta linhas próximas, alinhadas e com a mesma fonte em blocos"""
+    x0, y0, x1, y1, sizes = spans.x0, spans.y0, spans.x1, spans.y1, spans.sizes
+    
+    def line_box(line):
+        return (
+            min(x0[i] for i in line), min(y0[i] for i in line),
+            max(x1[i] for i in line), max(y1[i] for i in line),
+            max(sizes[i] for i in line)
+        )
+    
+    boxes = sorted((line_box(line) + (line,) for line in lines), key=lambda box: (box[1], box[0]))
+    blocks = []
+    open_blocks = []  # Blocos que ainda podem receber a próxima linha
+    for lx0, ly0, lx1, ly1, size, line in boxes:
+        target = None
+        still_open = []
+        for block in open_blocks:
+            bx0, _, bx1, _ = block['bbox']
+            gap = ly0 - block['_fim']
+            if gap > BLOCK_GAP * size:
+                continue  # Distante demais: nenhuma linha seguinte entra neste bloco
+            still_open.append(block)
+            if (target is None and lx0 < bx1 and bx0 < lx1
+                    and abs(size - block['tamanho']) <= BLOCK_SIZE_TOLERANCE):
+                target = block
+        open_blocks = still_open
+        
+        if target is None:
+            target = {'pagina': page, 'linhas': [], 'bbox': (lx0, ly0, lx1, ly1), 'tamanho': size}
+            blocks.append(target)
+            open_blocks.append(target)
+        else:
+            bx0, by0, bx1, by1 = target['bbox']
+            target['bbox'] = (min(bx0, lx0), by0, max(bx1, lx1), max(by1, ly1))
+            target['tamanho'] = max(target['tamanho'], size)
+        target['linhas'].append(line)
+        target['_fim'] = ly1
+    
+    for block in blocks:
+        del block['_fim']
+    return blocks
+
+
+def _line_ranges(spans: SpanStore, block: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """Intervalos horizontais (x0, x1) ocupados pelas linhas de um bloco"""
+    return [
+        (min(spans.x0[i] for i in line), max(spans.x1[i] for i in line))
+        for line in block['linhas']
+    ]
+
+
+def find_columns(line_ranges: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """
+    Encontra as colunas de uma página a partir dos intervalos horizontais das linhas
+    
+    Cada linha estreita soma 1 nas células de uma grade horizontal que ela
+    cobre (com um vetor de diferenças, em O(linhas + células)). Vãos largos
+    quase sem cobertura entre regiões com texto são as separações entre
+    colunas. Linhas de largura total ficam fora da contagem, e uma página em
+    que elas são maioria tem uma coluna só.
+    
+    Returns:
+        Intervalos (início, fim) das colunas, da esquerda para a direita,
+        divididos no meio de cada vão
+    """
+    if not line_ranges:
+        return []
+    left = min(x0 for x0, _ in line_ranges)
+    right = max(x1 for _, x1 in line_ranges)
+    cells = int((right - left) / GRID_STEP) + 1
+    narrow = [(x0, x1) for x0, x1 in line_ranges if x1 - x0 <= MAX_COLUMN_LINE * (right - left)]
+    if cells < 3 or 2 * len(narrow) < len(line_ranges):
+        return [(left, right)]
+    
+    diff = [0] * (cells + 1)
+    for x0, x1 in narrow:
+        diff[int((x0 - left) / GRID_STEP)] += 1
+        diff[int((x1 - left) / GRID_STEP) + 1] -= 1
+    
+    coverage = []
+    running = 0
+    for cell in range(cells):
+        running += diff[cell]
+        coverage.append(running)
+    
+    # Vãos: sequências de células com pouca cobertura, longe das bordas
+    limit = GUTTER_TOLERANCE * len(narrow)
+    min_cells = max(1, int(MIN_GUTTER / GRID_STEP))
+    min_width = MIN_COLUMN_WIDTH * (right - left)
+    columns = []
+    start = left
+    cell = 0
+    while cell < cells:
+        if coverage[cell] > limit:
+            cell += 1
+            continue
+        run_end = cell
+        while run_end < cells and coverage[run_end] <= limit:
+            run_end += 1
+        gutter_start = left + cell * GRID_STEP
+        gutter_end = left + run_end * GRID_STEP
+        if (run_end - cell >= min_cells and run_end < cells
+                and gutter_start - start >= min_width and right - gutter_end >= min_width):
+            # Vão largo entre duas regiões com texto: separação de colunas
+            middle = (gutter_start + gutter_end) / 2
+            columns.append((start, middle))
+            start = middle
+        cell = run_end
+    columns.append((start, right))
+    return columns
+
+
+def _reading_order(blocks: List[Dict[str, Any]], columns: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """Ordena os blocos lendo cada coluna até o fim antes da próxima
+    
+    Blocos que atravessam colunas (títulos, resumos) dividem a página em
+    faixas; dentro de cada faixa os blocos seguem a ordem (coluna, posição y).
+    """
+    tolerance = GRID_STEP * 2
+    for block in blocks:
+        bx0, _, bx1, _ = block['bbox']
+        block['coluna'] = None
+        for index, (cx0, cx1) in enumerate(columns):
+            if bx0 >= cx0 - tolerance and bx1 <= cx1 + tolerance:
+                block['coluna'] = index
+                break
+    
+    if len(columns) <= 1:
+        return sorted(blocks, key=lambda block: (block['bbox'][1], block['bbox'][0]))
+    
+    ordered = []
+    band = []
+    for block in sorted(blocks, key=lambda block: (block['bbox'][1], block['bbox'][0])):
+        if block['coluna'] is None:
+            ordered.extend(sorted(band, key=lambda b: (b['coluna'], b['bbox'][1])))
+            band = []
+            ordered.append(block)
+        else:
+            band.append(block)
+    ordered.extend(sorted(band, key=lambda b: (b['coluna'], b['bbox'][1])))
+    return ordered
+
+
+def line_text(spans: SpanStore, line: List[int]) -> str:
+    """Texto de uma linha, com espaço entre spans separados na horizontal"""
+    parts = []
+    prev = None
+    for i in line:
+        text = spans.text(i)
+        if prev is not None and parts[-1][-1:] != ' ' and text[:1] != ' ':
+            if spans.x0[i] - spans.x1[prev] > WORD_GAP * spans.sizes[i]:
+                parts.append(' ')
+        parts.append(text)
+        prev = i
+    return ''.join(parts).strip()
+
+
+def block_text(spans: SpanStore, block: Dict[str, Any]) -> str:
+    """Texto de um bloco, juntando as linhas e desfazendo hifenização no fim de linha"""
+    text = ""
+    for line in block['linhas']:
+        current = line_text(spans, line)
+        if not current:
+            continue
+        if not text:
+            text = current
+        elif text.endswith('-') and current[:1].islower():
+            text = text[:-1] + current
+        else:
+            text += ' ' + current
+    return text
@@ -5,13 +5,27 @@ if sys.stdout.encoding != 'utf-8':
 if sys.stderr.encoding != 'utf-8':
     sys.stderr.reconfigure(encoding='utf-8')
 
-from typing import Dict, Any, List
+import hashlib
+import tracemalloc
+from typing import Dict, Any, List, Iterator, Optional
 from pathlib import Path
 
+from .cache import ConversionCache, hash_file
+from .checkpoint import CheckpointStore
+from .document_session import DocumentSession, PageSelection, parse_page_ranges, format_page_ranges
+from .font_profile import FontProfile
+from .running_lines import RunningLines
+from .profiling import current_rss, measure_step
+from .scheduler import StepScheduler
+from .span_store import SpanStore
+from .text_store import DEFAULT_SPILL_THRESHOLD
+from .steps.preflight_step import PreflightStep, SKIPPED_WORK
 from .steps.text_extraction_step import TextExtractionStep
 from .steps.table_extraction_step import TableExtractionStep
+from .steps.table_mask_step import TableMaskStep
 from .steps.cleanup_step import CleanupStep
-from .steps.image_extraction_step import ImageExtractionStep
+from .steps.image_extraction_step import ImageExtractionStep, image_prefix as default_image_prefix
+from .steps.layout_step import LayoutStep
 from .steps.markdown_conversion_step import MarkdownConversionStep
 from .steps.advanced_markdown_conversion_step import AdvancedMarkdownConversionStep
 from .steps.spell_checking_step import SpellCheckingStep
@@ -20,31 +34,59 @@ from .steps.spell_checking_step import SpellCheckingStep
 class ConversionPipeline:
     """Pipeline principal para conversão de PDF para Markdown"""
     
-    def __init__(self, output_dir: str = "output"):
+    def __init__(self, output_dir: str = "output", workers: int = 1, profile: bool = False,
+                 cache: Optional[ConversionCache] = None, checkpoint_dir: str = None,
+                 concurrent_steps: bool = False, spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+                 table_engine: str = "pdfplumber", table_page_rows: int = None,
+                 image_passthrough: bool = True):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        # Número de processos para os passos que suportam paralelismo
+        self.workers = workers
+        
+        # Medir o pico de memória de cada passo (tracemalloc deixa a execução mais lenta)
+        self.profile = profile
+        
+        # Cache de conversões já feitas (None desativa)
+        self.cache = cache
+        
+        # Checkpoints do contexto após cada passo, para retomar com from_step
+        self.checkpoints = CheckpointStore(checkpoint_dir) if checkpoint_dir else None
+        
         # Inicializar passos do pipeline
         self.steps = [
-            TextExtractionStep(),
-            TableExtractionStep(),
-            CleanupStep(),
-            ImageExtractionStep(str(self.output_dir)),
-            MarkdownConversionStep(),
+            PreflightStep(),
+            TextExtractionStep(workers=workers, spill_threshold=spill_threshold),
+            TableExtractionStep(workers=workers, engine=table_engine),
+            TableMaskStep(spill_threshold=spill_threshold),
+            CleanupStep(spill_threshold=spill_threshold),
+            ImageExtractionStep(str(self.output_dir), passthrough=image_passthrough),
+            LayoutStep(),
+            MarkdownConversionStep(table_page_rows=table_page_rows),
             AdvancedMarkdownConversionStep(),
             SpellCheckingStep()
         ]
         
+        # Executar passos independentes em paralelo conforme suas dependências
+        self.scheduler = StepScheduler(self.steps, profile=profile) if concurrent_steps else None
+        
         # Dados da conversão atual
         self.current_data = {}
     
-    def convert(self, pdf_path: str, output_filename: str = None) -> Path:
+    def convert(self, pdf_path: str, output_filename: str = None, from_step: str = None,
+                pages: PageSelection = None, image_prefix: str = None) -> Path:
         """
         Converte PDF para Markdown
         
         Args:
             pdf_path: Caminho para o arquivo PDF
             output_filename: Nome do arquivo de saída (opcional)
+            from_step: Nome do passo a partir do qual retomar, usando o checkpoint
+                salvo pelo passo anterior (requer checkpoint_dir)
+            pages: Páginas a converter, a partir de 1 (ex.: "1-10,50-60" ou [1, 2, 3]);
+                None converte o documento inteiro
+            image_prefix: Prefixo dos arquivos de imagem (padrão: nome do arquivo de saída)
         
         Returns:
             Path para o arquivo Markdown gerado
@@ -54,49 +96,379 @@ class ConversionPipeline:
         if not pdf_path.exists():
             raise FileNotFoundError(f"Arquivo PDF não encontrado: {pdf_path}")
         
+        # Gerar nome do arquivo de saída
+        if output_filename is None:
+            output_filename = pdf_path.stem + ".md"
+        
+        output_path = self.output_dir / output_filename
+        # Imagens nomeadas pelo arquivo de saída: documentos no mesmo diretório não se sobrescrevem
+        prefix = image_prefix or default_image_prefix(output_filename)
+        
+        page_ranges = parse_page_ranges(pages)
+        file_hash = None
+        if self.cache is not None or self.checkpoints is not None:
+            file_hash = self._input_hash(pdf_path, page_ranges)
+        
+        # Ponto de partida: início do pipeline ou o checkpoint do passo anterior
+        start_index = 0
+        restored_data = {}
+        if from_step is not None:
+            start_index, restored_data = self._load_checkpoint(file_hash, from_step)
+        
+        # Reaproveitar o resultado se o PDF e o pipeline não mudaram
+        # (ao retomar de um passo a conversão é sempre refeita a partir dele)
+        cache_key = None
+        if self.cache is not None:
+            # O Markdown guardado referencia as imagens pelo prefixo, que entra na chave
+            cache_key = self.cache.make_key(file_hash, f"{self.fingerprint()}|{prefix}")
+            meta = None
+            if from_step is None:
+                meta = self.cache.restore(cache_key, output_path, self.output_dir / "images")
+            if meta is not None:
+                self.current_data = {
+                    'pdf_path': str(pdf_path),
+                    'output_dir': str(self.output_dir),
+                    'cache_hit': True,
+                    'cached_stats': meta['stats']
+                }
+                print(f"Conversão recuperada do cache: {output_path}")
+                return output_path
+        
+        # Abrir o PDF uma única vez e compartilhar com todos os passos
+        session = DocumentSession(str(pdf_path), page_ranges)
+        
         # Preparar dados iniciais
-        self.current_data = {
+        self.current_data = dict(restored_data)
+        self.current_data.update({
             'pdf_path': str(pdf_path),
-            'output_dir': str(self.output_dir)
-        }
+            'output_dir': str(self.output_dir),
+            'pages': page_ranges,
+            'image_prefix': prefix,
+            'session': session,
+            'step_metrics': []
+        })
         
         # Executar pipeline
-        print(f"Iniciando conversão de {pdf_path.name}...")
+        if start_index:
+            print(f"Retomando conversão de {pdf_path.name} a partir de {self.steps[start_index].name}...")
+        else:
+            print(f"Iniciando conversão de {pdf_path.name}...")
         
-        for step in self.steps:
-            print(f"Executando passo: {step.name}")
-            try:
-                self.current_data = step.process(self.current_data)
-            except Exception as e:
-                print(f"Erro no passo {step.name}: {e}")
-                raise
+        started_tracing = self.profile and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
         
-        # Gerar nome do arquivo de saída
-        if output_filename is None:
-            output_filename = pdf_path.stem + ".md"
+        def save_checkpoint(index: int):
+            # O último passo não precisa de checkpoint: não há de onde retomar depois dele
+            if self.checkpoints is not None and index + 1 < len(self.steps):
+                self.checkpoints.save(file_hash, self.steps[:index + 1], self.current_data)
         
-        output_path = self.output_dir / output_filename
+        try:
+            if self.scheduler is not None:
+                self.current_data = self.scheduler.run(
+                    self.current_data, start_index, self._run_step, save_checkpoint
+                )
+            else:
+                for index in range(start_index, len(self.steps)):
+                    step = self.steps[index]
+                    print(f"Executando passo: {step.name}")
+                    try:
+                        self.current_data = self._run_step(step, self.current_data)
+                    except Exception as e:
+                        print(f"Erro no passo {step.name}: {e}")
+                        raise
+                    save_checkpoint(index)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            session.close()
+            self.current_data.pop('session', None)
         
         # Salvar arquivo Markdown
         markdown_content = self.current_data.get('markdown_content', '')
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(markdown_content)
         
+        if cache_key is not None:
+            stats = self.get_statistics()
+            del stats['step_metrics']
+            image_paths = [image['caminho'] for image in self.current_data.get('images', [])]
+            self.cache.store(cache_key, output_path, image_paths, {'stats': stats})
+        
+        print(f"Conversão concluída: {output_path}")
+        return output_path
+    
+    def _load_checkpoint(self, file_hash: str, from_step: str):
+        """Localiza o passo pelo nome e carrega o contexto salvo pelo passo anterior"""
+        step_names = [step.name for step in self.steps]
+        matches = [i for i, name in enumerate(step_names) if name.lower() == from_step.lower()]
+        if not matches:
+            raise ValueError(f"Passo desconhecido: {from_step} (disponíveis: {', '.join(step_names)})")
+        
+        start_index = matches[0]
+        if start_index == 0:
+            return 0, {}
+        
+        if self.checkpoints is None:
+            raise ValueError("Retomar a partir de um passo requer checkpoint_dir")
+        
+        restored_data = self.checkpoints.load(file_hash, self.steps[:start_index])
+        if restored_data is None:
+            raise ValueError(
+                f"Nenhum checkpoint de {self.steps[start_index - 1].name} para este PDF; "
+                f"execute a conversão completa com checkpoints primeiro"
+            )
+        return start_index, restored_data
+    
+    @staticmethod
+    def _input_hash(pdf_path: Path, page_ranges) -> str:
+        """Hash do PDF, combinado com a seleção de páginas quando houver uma"""
+        file_hash = hash_file(str(pdf_path))
+        if page_ranges is None:
+            return file_hash
+        selection = f"{file_hash}|pages={format_page_ranges(page_ranges)}"
+        return hashlib.sha256(selection.encode('utf-8')).hexdigest()
+    
+    def fingerprint(self) -> str:
+        """Identifica os passos, versões e opções que determinam o resultado"""
+        return '|'.join(step.fingerprint() for step in self.steps)
+    
+    def _run_step(self, step, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Executa um passo registrando tempo de parede, tempo de CPU e pico de memória"""
+        data, metrics = measure_step(step, data, self.profile)
+        data.setdefault('step_metrics', []).append(metrics)
+        return data
+    
+    def convert_stream(self, pdf_path: str, output_filename: str = None,
+                       pages: PageSelection = None) -> Path:
+        """
+        Converte PDF para Markdown página a página, gravando a saída incrementalmente
+        
+        Extração, limpeza e conversão rodam como geradores encadeados sobre as
+        páginas, e cada página é anexada ao arquivo assim que termina. Como só
+        uma página fica em memória por vez, o passo AdvancedMarkdownConversion
+        (que compara métodos sobre o documento inteiro) não é aplicado.
+        
+        Args:
+            pdf_path: Caminho para o arquivo PDF
+            output_filename: Nome do arquivo de saída (opcional)
+            pages: Páginas a converter, a partir de 1 (None converte todas)
+        
+        Returns:
+            Path para o arquivo Markdown gerado
+        """
+        # Validar entrada
+        pdf_path = Path(pdf_path)
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"Arquivo PDF não encontrado: {pdf_path}")
+        
+        if output_filename is None:
+            output_filename = pdf_path.stem + ".md"
+        output_path = self.output_dir / output_filename
+        
+        session = DocumentSession(str(pdf_path), pages)
+        
+        # No modo streaming guardamos apenas contadores e metadados leves
+        self.current_data = {
+            'pdf_path': str(pdf_path),
+            'output_dir': str(self.output_dir),
+            'pages': session.page_ranges,
+            'image_prefix': default_image_prefix(output_filename),
+            'total_pages': len(session.page_numbers),
+            'table_candidates': {},
+            'stream_counts': {
+                'tables': 0,
+                'images': 0,
+                'text_blocks': 0,
+                'font_info': 0,
+                'raw_text': 0,
+                'cleaned_text': 0,
+                'markdown_content': 0,
+                'markdown_lines': 0
+            }
+        }
+        
+        print(f"Iniciando conversão em streaming de {pdf_path.name}...")
+        
+        try:
+            pages = self._stream_extract(session)
+            pages = self._stream_cleanup(pages)
+            chunks = self._stream_markdown(pages)
+            
+            counts = self.current_data['stream_counts']
+            with open(output_path, 'w', encoding='utf-8') as f:
+                for chunk in chunks:
+                    if counts['markdown_content']:
+                        f.write('\n\n')
+                        counts['markdown_content'] += 2
+                        counts['markdown_lines'] += 2
+                    f.write(chunk)
+                    f.flush()  # Disponibilizar a página para quem já está lendo o arquivo
+                    counts['markdown_content'] += len(chunk)
+                    counts['markdown_lines'] += chunk.count('\n')
+            counts['markdown_lines'] += 1
+        finally:
+            session.close()
+        
         print(f"Conversão concluída: {output_path}")
         return output_path
     
+    def close(self):
+        """Libera os recursos mantidos entre conversões (pool de processos do escalonador)"""
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+    
+    def _get_step(self, step_class):
+        """Retorna a instância do passo da classe informada"""
+        for step in self.steps:
+            if isinstance(step, step_class):
+                return step
+        raise LookupError(f"Passo {step_class.__name__} não configurado no pipeline")
+    
+    def _stream_extract(self, session: DocumentSession) -> Iterator[Dict[str, Any]]:
+        """Estágio de extração: produz texto, fontes, tabelas e imagens de cada página"""
+        preflight_step = self._get_step(PreflightStep)
+        table_step = self._get_step(TableExtractionStep)
+        image_step = self._get_step(ImageExtractionStep)
+        counts = self.current_data['stream_counts']
+        
+        for page_num in session.page_numbers:
+            # Triagem da página antes de decidir quais extrações valem a pena
+            triage = preflight_step.triage_page(session, page_num)
+            skipped = SKIPPED_WORK[triage['tipo']]
+            
+            font_info = SpanStore()
+            page_text = ""
+            if 'text' not in skipped:
+                page_text = TextExtractionStep.extract_page(session, page_num, font_info)
+            
+            tables = []
+            if 'tables' not in skipped:
+                # Só páginas com bordas desenhadas vão para o pdfplumber, recortadas às regiões
+                candidate = table_step.find_candidate_regions(session, page_num)
+                self.current_data['table_candidates'][page_num] = candidate
+                if candidate['candidata']:
+                    tables = table_step.extract_page_tables(session, page_num, candidate['regioes'])
+                    candidate['tabelas'] = len(tables)
+                    table_step.backend.release_page(session, page_num)  # Liberar objetos de layout em cache
+                candidate['memoria_rss'] = current_rss()
+            
+            if tables:
+                # O texto das tabelas sai do texto corrido: ele já está nas células
+                font_info, masked = TableMaskStep.mask_spans(font_info, tables)
+                if masked:
+                    page_text = TableMaskStep.page_text(font_info, list(range(len(font_info))))
+            text_blocks = font_info.texts()
+            
+            images = []
+            if 'images' not in skipped:
+                images = image_step.extract_page_images(
+                    session, page_num, self.current_data['image_prefix']
+                )
+            session.release_page(page_num)
+            
+            raw_text = page_text + "\n\n" if page_text.strip() else ""
+            counts['text_blocks'] += len(text_blocks)
+            counts['font_info'] += len(font_info)
+            counts['raw_text'] += len(raw_text)
+            counts['tables'] += len(tables)
+            counts['images'] += len(images)
+            
+            yield {
+                'pagina': page_num + 1,
+                'raw_text': raw_text,
+                'font_info': font_info,
+                'text_blocks': text_blocks,
+                'tables': tables,
+                'images': images
+            }
+    
+    def _stream_cleanup(self, pages: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Estágio de limpeza: remove cabeçalhos e rodapés página a página"""
+        cleanup_step = self._get_step(CleanupStep)
+        counts = self.current_data['stream_counts']
+        # Linhas de topo e base acumuladas com as páginas já vistas
+        running_lines = RunningLines()
+        
+        for page in pages:
+            font_info = cleanup_step.drop_running_lines(running_lines, page['font_info'])
+            if font_info is not page['font_info']:
+                page['font_info'] = font_info
+                page['text_blocks'] = font_info.texts()
+            cleaned_blocks = cleanup_step.clean_blocks(page['text_blocks'])
+            page['cleaned_text'] = '\n'.join(cleaned_blocks)
+            counts['cleaned_text'] += len(page['cleaned_text'])
+            yield page
+        self.current_data['running_lines'] = running_lines.running_texts()
+    
+    def _stream_markdown(self, pages: Iterator[Dict[str, Any]]) -> Iterator[str]:
+        """Estágio de conversão: gera o Markdown de cada página"""
+        markdown_step = self._get_step(MarkdownConversionStep)
+        spell_step = self._get_step(SpellCheckingStep)
+        total_corrections = 0
+        # Perfil de fontes acumulado com as páginas já vistas
+        font_profile = FontProfile()
+        
+        for page in pages:
+            font_profile.update(page['font_info'])
+            parts = markdown_step.convert_parts(
+                page['font_info'],
+                page['raw_text'],
+                page['cleaned_text'],
+                page['tables'],
+                page['images'],
+                font_profile=font_profile
+            )
+            # As tabelas e imagens da página já estão no Markdown
+            page['tables'] = page['images'] = None
+            markdown = '\n\n'.join(part for part in parts if part)
+            if not markdown:
+                continue
+            
+            markdown, corrections = spell_step.correct_spelling(markdown)
+            total_corrections += corrections['corrected_words']
+            self.current_data['spell_corrections'] = {'total_corrections': total_corrections}
+            yield markdown
+    
     def get_statistics(self) -> Dict[str, Any]:
         """Retorna estatísticas da conversão"""
+        # Conversão recuperada do cache: estatísticas gravadas na entrada
+        if self.current_data.get('cache_hit'):
+            return dict(self.current_data['cached_stats'], cache_hit=True, step_metrics=[])
+        
+        # No modo streaming o conteúdo não fica em memória, apenas os contadores
+        counts = self.current_data.get('stream_counts')
+        if counts is None:
+            markdown_content = self.current_data.get('markdown_content', '')
+            counts = {
+                'tables': len(self.current_data.get('tables', [])),
+                'images': len(self.current_data.get('images', [])),
+                'text_blocks': len(self.current_data.get('text_blocks', [])),
+                'font_info': len(self.current_data.get('font_info', [])),
+                'raw_text': len(self.current_data.get('raw_text', '')),
+                'cleaned_text': len(self.current_data.get('cleaned_text', '')),
+                'markdown_content': len(markdown_content),
+                'markdown_lines': len(markdown_content.split('\n'))
+            }
+        
         stats = {
             'total_pages': self.current_data.get('total_pages', 0),
-            'text_blocks': len(self.current_data.get('text_blocks', [])),
-            'tables': len(self.current_data.get('tables', [])),
-            'images': len(self.current_data.get('images', [])),
-            'font_info_entries': len(self.current_data.get('font_info', [])),
-            'raw_text_length': len(self.current_data.get('raw_text', '')),
-            'cleaned_text_length': len(self.current_data.get('cleaned_text', '')),
-            'markdown_length': len(self.current_data.get('markdown_content', '')),
-            'markdown_lines': len(self.current_data.get('markdown_content', '').split('\n')),
-            'method_chosen': self.current_data.get('method_chosen', 'unknown')
+            'text_blocks': counts['text_blocks'],
+            'tables': counts['tables'],
+            # Decisão do pré-filtro de tabelas para cada página examinada
+            'table_candidates': [info for _, info in sorted(self.current_data.get('table_candidates', {}).items())],
+            'table_peak_rss': max(
+                (info['memoria_rss'] or 0 for info in self.current_data.get('table_candidates', {}).values()),
+                default=0
+            ) or None,
+            'images': counts['images'],
+            'font_info_entries': counts['font_info'],
+            'raw_text_length': counts['raw_text'],
+            'cleaned_text_length': counts['cleaned_text'],
+            'markdown_length': counts['markdown_content'],
+            'markdown_lines': counts['markdown_lines'],
+            'method_chosen': self.current_data.get('method_chosen', 'unknown'),
+            'step_metrics': self.current_data.get('step_metrics', []),
+            'cache_hit': False
         }
         return stats
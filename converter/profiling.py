@@ -0,0 +1,61 @@
+"""Medição de tempo e memória dos passos do pipeline"""
+
+import os
+import time
+import tracemalloc
+from typing import Dict, Any, Optional, Tuple
+
+
+def current_rss() -> Optional[int]:
+    """Memória residente (RSS) atual do processo em bytes, ou None se não for possível medir"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Sem /proc, o melhor disponível é o pico do processo (em KB no Linux, em bytes no macOS)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+def cpu_time() -> float:
+    """Tempo de CPU do processo somado ao dos processos filhos já encerrados"""
+    times = os.times()
+    # process_time() não inclui os workers de ProcessPoolExecutor, que o passo encerra ao terminar
+    return time.process_time() + times.children_user + times.children_system
+
+
+def measure_step(step, data: Dict[str, Any], profile: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Executa um passo registrando tempo de parede, tempo de CPU e pico de memória
+    
+    O tempo de CPU inclui os processos filhos encerrados durante o passo
+    (ex.: extração com ``workers > 1``). O pico de memória só é medido com
+    ``profile=True`` e exige que o tracemalloc já esteja ativo no processo.
+    
+    Returns:
+        Tupla (dados retornados pelo passo, métricas do passo)
+    """
+    profile = profile and tracemalloc.is_tracing()
+    if profile:
+        tracemalloc.reset_peak()
+        memory_start = tracemalloc.get_traced_memory()[0]
+    wall_start = time.perf_counter()
+    cpu_start = cpu_time()
+    
+    data = step.process(data)
+    
+    metrics = {
+        'step': step.name,
+        'wall_time': time.perf_counter() - wall_start,
+        'cpu_time': cpu_time() - cpu_start,
+        'peak_memory': None
+    }
+    if profile:
+        # Pico alocado durante o passo, acima do que já estava em uso ao iniciar
+        metrics['peak_memory'] = max(0, tracemalloc.get_traced_memory()[1] - memory_start)
+    return data, metrics
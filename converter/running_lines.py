@@ -0,0 +1,112 @@
+"""Detecção de cabeçalhos e rodapés que se repetem entre páginas"""
+
+import hashlib
+import math
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .layout import group_lines, line_text
+from .span_store import SpanStore
+
+
+# Linhas do topo e da base de cada página que podem ser cabeçalho ou rodapé
+BAND_LINES = 3
+# Uma linha é repetida quando aparece em pelo menos MIN_PAGES páginas e nesta fração do documento
+MIN_PAGES = 3
+MIN_PAGE_RATIO = 0.3
+
+_DIGITS = re.compile(r'\d+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_line(text: str, mask_digits: bool = True) -> str:
+    """Forma canônica de uma linha: minúsculas, espaços colapsados e números trocados por '#'"""
+    text = text.lower()
+    if mask_digits:
+        text = _DIGITS.sub('#', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def _line_key(band: str, normalized: str) -> int:
+    """Hash estável (64 bits) da linha normalizada, separado por faixa (topo/base)"""
+    digest = hashlib.blake2b(f"{band}|{normalized}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class RunningLines:
+    """Contagem, entre páginas, das linhas do topo e da base de cada página
+    
+    Cada página contribui uma única vez com o hash de cada linha normalizada
+    das suas faixas superior e inferior. Na linha mais externa de cada faixa,
+    onde fica a numeração, números viram '#' para que "Página 3" e
+    "Página 4" coincidam; nas demais o texto precisa ser igual. Linhas que se repetem em muitas
+    páginas são títulos correntes, nomes de periódico ou numeração, e seus
+    spans podem ser descartados antes dos passos seguintes.
+    """
+    
+    def __init__(self, band_lines: int = BAND_LINES, min_pages: int = MIN_PAGES,
+                 min_ratio: float = MIN_PAGE_RATIO):
+        self.band_lines = band_lines
+        self.min_pages = min_pages
+        self.min_ratio = min_ratio
+        self.pages = 0
+        self.counts: Dict[int, int] = {}
+        self.texts: Dict[int, str] = {}
+    
+    @property
+    def threshold(self) -> int:
+        """Número de páginas a partir do qual uma linha é considerada repetida"""
+        return max(self.min_pages, math.ceil(self.min_ratio * self.pages))
+    
+    def update(self, spans: SpanStore, indices: Iterable[int]) -> List[Tuple[int, List[int]]]:
+        """
+        Conta as linhas das faixas superior e inferior de uma página
+        
+        Returns:
+            Pares (hash, índices dos spans da linha) das linhas candidatas da página
+        """
+        lines = group_lines(spans, indices)
+        self.pages += 1
+        # As faixas ficam com no máximo um terço das linhas: o resto é o corpo da página
+        band = min(self.band_lines, len(lines) // 3)
+        if not band:
+            return []
+        
+        bottom_start = len(lines) - band
+        candidates = []
+        seen = set()
+        for name, band_lines in (('top', lines[:band]), ('bottom', lines[bottom_start:])):
+            outermost = band_lines[0] if name == 'top' else band_lines[-1]
+            for line in band_lines:
+                normalized = normalize_line(line_text(spans, line), mask_digits=line is outermost)
+                if not normalized:
+                    continue
+                key = _line_key(name, normalized)
+                candidates.append((key, line))
+                if key not in seen:
+                    seen.add(key)
+                    self.counts[key] = self.counts.get(key, 0) + 1
+                    self.texts.setdefault(key, normalized)
+        return candidates
+    
+    def is_running(self, key: int) -> bool:
+        return self.counts.get(key, 0) >= self.threshold
+    
+    def running_texts(self) -> List[str]:
+        """Formas normalizadas das linhas repetidas encontradas até agora"""
+        return sorted(self.texts[key] for key in self.counts if self.is_running(key))
+    
+    def find(self, spans: SpanStore, page_indices: Dict[int, List[int]] = None) -> Set[int]:
+        """Conta as linhas de todas as páginas e retorna os índices dos spans repetidos"""
+        if page_indices is None:
+            page_indices = spans.page_indices()
+        
+        candidates = []
+        for page in sorted(page_indices):
+            candidates.extend(self.update(spans, page_indices[page]))
+        
+        dropped = set()
+        for key, line in candidates:
+            if self.is_running(key):
+                dropped.update(line)
+        return dropped
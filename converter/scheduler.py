@@ -0,0 +1,156 @@
+"""Escalonador de passos baseado nas dependências entre eles"""
+
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Set, Callable
+
+from .profiling import measure_step
+
+
+# Chaves de entrada que qualquer passo pode receber (não são produzidas por passos)
+INPUT_KEYS = ('pdf_path', 'output_dir', 'pages', 'image_prefix')
+
+# Chaves pequenas que podem ser enviadas a um passo executado em outro processo
+SHAREABLE_KEYS = INPUT_KEYS + ('page_triage',)
+
+
+def _run_isolated(step, data: Dict[str, Any], profile: bool):
+    """Executa um passo em outro processo e devolve apenas as chaves que ele produz"""
+    started_tracing = profile and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        result, metrics = measure_step(step, data, profile)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        # A sessão aberta neste processo não pode voltar para o processo principal
+        session = data.get('session')
+        if session is not None:
+            session.close()
+    return {key: result[key] for key in step.provides if key in result}, metrics
+
+
+class StepScheduler:
+    """Executa os passos em paralelo, respeitando as chaves que cada um lê e escreve
+    
+    As dependências são derivadas de ``requires``/``provides`` na ordem da
+    lista: um passo espera os anteriores que escrevem o que ele lê ou escreve e
+    os que leem o que ele escreve. Passos que só dependem das entradas
+    (``pdf_path``) e de chaves pequenas como a triagem das páginas rodam em
+    processos separados, com seu próprio handle do PDF; o primeiro deles e os
+    demais passos rodam no processo principal, onde compartilham a sessão do
+    documento.
+    """
+    
+    def __init__(self, steps: List, max_workers: int = None, profile: bool = False):
+        self.steps = steps
+        self.max_workers = max_workers
+        self.profile = profile
+        self._executor = None
+    
+    def dependencies(self) -> Dict[int, Set[int]]:
+        """Mapeia o índice de cada passo para os índices dos passos de que depende"""
+        deps = {}
+        for i, step in enumerate(self.steps):
+            deps[i] = set()
+            for j in range(i):
+                if self._conflicts(self.steps[j], step):
+                    deps[i].add(j)
+        return deps
+    
+    @staticmethod
+    def _conflicts(earlier, later) -> bool:
+        """Indica se ``later`` precisa esperar ``earlier`` terminar"""
+        if earlier.provides is None or later.provides is None:
+            return True
+        if earlier.requires is None or later.requires is None:
+            return True
+        earlier_writes = set(earlier.provides)
+        later_writes = set(later.provides)
+        return bool(
+            earlier_writes & set(later.requires)      # leitura após escrita
+            or earlier_writes & later_writes          # escrita após escrita
+            or set(earlier.requires) & later_writes   # escrita após leitura
+        )
+    
+    def _is_isolated(self, step) -> bool:
+        """Passos que só leem as entradas e chaves pequenas podem rodar em outro processo"""
+        return step.requires is not None and set(step.requires) <= set(SHAREABLE_KEYS)
+    
+    def run(self, data: Dict[str, Any], start_index: int,
+            run_step: Callable[[Any, Dict[str, Any]], Dict[str, Any]],
+            on_prefix_complete: Callable[[int], None]) -> Dict[str, Any]:
+        """
+        Executa os passos a partir de ``start_index``
+        
+        Args:
+            data: Contexto compartilhado (modificado no lugar)
+            start_index: Primeiro passo a executar; os anteriores já estão em ``data``
+            run_step: Executa um passo no processo principal e retorna o contexto
+            on_prefix_complete: Chamado, em ordem, com o índice de cada passo
+                quando ele e todos os anteriores da lista terminaram
+        
+        Returns:
+            O contexto com os resultados de todos os passos
+        """
+        deps = self.dependencies()
+        done = set(range(start_index))
+        pending = set(range(start_index, len(self.steps)))
+        running = {}
+        next_prefix = start_index
+        
+        try:
+            while pending or running:
+                ready = sorted(i for i in pending if deps[i] <= done)
+                
+                # O primeiro passo pronto fica no processo principal; os isolados restantes vão para o pool
+                offload = [i for i in ready[1:] if self._is_isolated(self.steps[i])]
+                for i in offload:
+                    step = self.steps[i]
+                    print(f"Executando passo em paralelo: {step.name}")
+                    subset = {key: data[key] for key in SHAREABLE_KEYS if key in data}
+                    future = self._get_executor().submit(_run_isolated, step, subset, self.profile)
+                    running[future] = i
+                    pending.discard(i)
+                
+                inline = [i for i in ready if i in pending]
+                if inline:
+                    i = inline[0]
+                    step = self.steps[i]
+                    print(f"Executando passo: {step.name}")
+                    data = run_step(step, data)
+                    pending.discard(i)
+                    done.add(i)
+                elif running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        i = running.pop(future)
+                        result, metrics = future.result()
+                        data.update(result)
+                        data.setdefault('step_metrics', []).append(metrics)
+                        done.add(i)
+                elif pending:
+                    raise RuntimeError("Dependências circulares entre os passos do pipeline")
+                
+                while next_prefix in done and next_prefix < len(self.steps):
+                    if next_prefix >= start_index:
+                        on_prefix_complete(next_prefix)
+                    next_prefix += 1
+        finally:
+            for future in running:
+                future.cancel()
+        
+        return data
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Pool de processos criado sob demanda e reaproveitado entre conversões"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+    
+    def shutdown(self):
+        """Encerra o pool de processos, se tiver sido criado"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
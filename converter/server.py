@@ -0,0 +1,287 @@
+"""Servidor local de conversão com pipelines pré-carregados"""
+
+import asyncio
+import json
+import multiprocessing.util
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from .cache import hash_file
+from .document_session import parse_page_ranges
+from .pipeline import ConversionPipeline
+
+
+# Pipeline pré-carregado de cada processo do pool
+_server_pipeline: Optional[ConversionPipeline] = None
+
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Caracteres de Markdown lidos do arquivo por bloco da resposta
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _init_worker(output_dir: str, pipeline_options: Dict[str, Any]):
+    """Importa as dependências e monta o pipeline uma única vez por processo"""
+    global _server_pipeline
+    _server_pipeline = ConversionPipeline(output_dir, **pipeline_options)
+    # Fechar o pipeline quando o processo sair no encerramento do pool
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    """Libera os recursos do pipeline do processo"""
+    global _server_pipeline
+    if _server_pipeline is not None:
+        _server_pipeline.close()
+        _server_pipeline = None
+
+
+def _convert_request(pdf_path: str, output_filename: str, pages: str = None) -> Dict[str, Any]:
+    """Converte um PDF com o pipeline do processo e devolve o arquivo gerado e as estatísticas"""
+    # Imagens nomeadas pelo conteúdo do PDF: não colidem entre documentos e o cache continua valendo
+    image_prefix = f"pdf-{hash_file(pdf_path)[:16]}"
+    output_path = _server_pipeline.convert(pdf_path, output_filename, pages=pages, image_prefix=image_prefix)
+    # O Markdown não volta pelo pool: o processo principal o envia direto do arquivo
+    return {
+        'output': str(output_path),
+        'image_prefix': image_prefix,
+        'stats': _server_pipeline.get_statistics()
+    }
+
+
+class ConversionServer:
+    """Servidor HTTP (TCP ou socket Unix) que converte PDFs em um pool de processos
+    
+    Rotas:
+        POST /convert  corpo ``application/pdf`` (upload) ou JSON ``{"path": ...}``;
+                       ``?name=saida.md`` define o início do nome do arquivo gerado e
+                       ``?pages=1-10`` restringe as páginas convertidas
+        GET  /health   estado do servidor e tamanho da fila
+    
+    A resposta de /convert é um JSON ``{"output", "stats", "markdown"}`` enviado
+    com ``Transfer-Encoding: chunked``: o Markdown é lido do arquivo gerado e
+    enviado em blocos, sem ser montado inteiro em memória. Cada requisição
+    grava em um arquivo próprio (``?name=`` vira apenas o início do nome), e o
+    Markdown e as imagens são apagados depois de enviada a resposta.
+    
+    Quando há mais de ``pool_size + queue_size`` requisições em andamento o
+    servidor responde 503 com ``Retry-After``, em vez de acumular uploads em memória.
+    """
+    
+    def __init__(self, output_dir: str = "output", pool_size: int = None, queue_size: int = 16,
+                 max_upload_size: int = 200 * 1024 * 1024, **pipeline_options):
+        self.output_dir = str(output_dir)
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_upload_size = max_upload_size
+        self.pipeline_options = pipeline_options
+        self.upload_dir = Path(tempfile.mkdtemp(prefix="pdf_to_markdown_uploads_"))
+        self.pending = 0
+        self.executor = None
+    
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, socket_path: str = None):
+        """Inicia o pool e atende requisições até ser interrompido"""
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_init_worker,
+            initargs=(self.output_dir, self.pipeline_options)
+        )
+        # Aquecer todos os processos antes de aceitar conexões
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, os.getpid) for _ in range(self.pool_size)
+        ))
+        
+        if socket_path:
+            server = await asyncio.start_unix_server(self._handle_connection, path=socket_path)
+            address = socket_path
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            address = f"http://{host}:{port}"
+        
+        print(f"🚀 Servidor de conversão em {address} ({self.pool_size} processos, fila de {self.queue_size})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            shutil.rmtree(self.upload_dir, ignore_errors=True)
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, payload = await self._handle_request(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            status, payload = 500, {'error': str(e)}
+        
+        converted = status == 200 and 'output' in payload
+        try:
+            if converted:
+                await self._send_conversion(writer, payload)
+            else:
+                await self._send_json(writer, status, payload)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            if converted:
+                self._discard_outputs(payload)
+    
+    def _discard_outputs(self, result: Dict[str, Any]):
+        """Apaga o Markdown e as imagens de uma conversão já enviada"""
+        Path(result['output']).unlink(missing_ok=True)
+        for image_path in (Path(self.output_dir) / "images").glob(f"{result['image_prefix']}_p*"):
+            image_path.unlink(missing_ok=True)
+    
+    async def _handle_request(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any]]:
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        if not request_line:
+            return 400, {'error': "Requisição vazia"}
+        try:
+            method, target, _ = request_line.split(' ', 2)
+        except ValueError:
+            return 400, {'error': "Linha de requisição inválida"}
+        
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {
+                'status': 'ok',
+                'pending': self.pending,
+                'pool_size': self.pool_size,
+                'queue_size': self.queue_size
+            }
+        if url.path != "/convert":
+            return 404, {'error': f"Rota não encontrada: {url.path}"}
+        if method != "POST":
+            return 405, {'error': "Use POST em /convert"}
+        
+        # Backpressure: recusar antes de ler o corpo quando a fila está cheia
+        if self.pending >= self.pool_size + self.queue_size:
+            return 503, {'error': "Fila cheia, tente novamente"}
+        
+        try:
+            content_length = int(headers.get('content-length', 0))
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            return 400, {'error': "Content-Length inválido"}
+        if content_length > self.max_upload_size:
+            return 413, {'error': f"Upload maior que {self.max_upload_size} bytes"}
+        
+        self.pending += 1
+        try:
+            body = await reader.readexactly(content_length)
+            query = parse_qs(url.query)
+            return await self._convert(body, headers.get('content-type', ''), query)
+        finally:
+            self.pending -= 1
+    
+    async def _convert(self, body: bytes, content_type: str, query: Dict[str, list]) -> Tuple[int, Dict[str, Any]]:
+        output_filename = query.get('name', [None])[0]
+        pages = query.get('pages', [None])[0]
+        if pages is not None:
+            try:
+                parse_page_ranges(pages)
+            except ValueError as e:
+                return 400, {'error': str(e)}
+        upload_path = None
+        
+        if content_type.startswith('application/json'):
+            try:
+                pdf_path = json.loads(body.decode('utf-8'))['path']
+            except (ValueError, KeyError, TypeError):
+                return 400, {'error': "JSON deve conter o campo 'path'"}
+            if not Path(pdf_path).exists():
+                return 404, {'error': f"Arquivo PDF não encontrado: {pdf_path}"}
+        else:
+            if not body.startswith(b'%PDF'):
+                return 400, {'error': "O corpo não é um PDF"}
+            upload_path = self.upload_dir / f"upload_{uuid.uuid4().hex[:12]}.pdf"
+            upload_path.write_bytes(body)
+            pdf_path = str(upload_path)
+        
+        # Nome único por requisição: duas conversões simultâneas nunca gravam o mesmo arquivo
+        # (o nome pedido é só o início, sem diretórios, para não escapar do diretório de saída)
+        base_name = Path(output_filename).stem if output_filename else Path(pdf_path).stem
+        output_filename = f"{base_name}_{uuid.uuid4().hex[:12]}.md"
+        
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, _convert_request, pdf_path, output_filename, pages)
+        except Exception as e:
+            return 500, {'error': str(e)}
+        finally:
+            if upload_path is not None:
+                upload_path.unlink(missing_ok=True)
+        return 200, result
+    
+    async def _send_conversion(self, writer: asyncio.StreamWriter, result: Dict[str, Any]):
+        """Envia o resultado da conversão em blocos, lendo o Markdown do arquivo de saída"""
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode('latin-1'))
+        
+        async def send_chunk(text: str):
+            data = text.encode('utf-8')
+            if data:
+                writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+                await writer.drain()
+        
+        # O campo markdown fica por último para ser escrito à medida que o arquivo é lido
+        head = json.dumps({'output': Path(result['output']).name, 'stats': result['stats']}, ensure_ascii=False)
+        await send_chunk(head[:-1] + ', "markdown": "')
+        with open(result['output'], 'r', encoding='utf-8') as f:
+            while True:
+                text = f.read(STREAM_CHUNK_SIZE)
+                if not text:
+                    break
+                # Cada bloco é escapado como o conteúdo de uma string JSON
+                await send_chunk(json.dumps(text, ensure_ascii=False)[1:-1])
+        await send_chunk('"}')
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = [
+            f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1'))
+        
+        # Enviar o corpo em blocos, respeitando o buffer do cliente
+        chunk_size = 64 * 1024
+        for start in range(0, len(body), chunk_size):
+            writer.write(body[start:start + chunk_size])
+            await writer.drain()
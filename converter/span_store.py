@@ -0,0 +1,186 @@
+"""Armazenamento colunar dos spans de texto extraídos do PDF"""
+
+from array import array
+from typing import Dict, Any, List, Iterable, Iterator, Sequence, Tuple
+
+
+class SpanStore:
+    """Tabela colunar de spans (texto, tamanho, bbox, página e fonte)
+    
+    Em vez de um dict por span, cada atributo fica em um ``array`` compacto:
+    tamanhos e bboxes em float32, páginas e fontes em int32 (o nome da fonte
+    é internado em ``fonts``) e todo o texto em um único buffer com offsets.
+    Para compatibilidade, indexar ou iterar a tabela produz dicts no formato
+    antigo de ``font_info`` (``text``, ``tamanho``, ``posicao``, ``pagina``, ``fonte``).
+    """
+    
+    def __init__(self):
+        self.sizes = array('f')
+        self.x0 = array('f')
+        self.y0 = array('f')
+        self.x1 = array('f')
+        self.y1 = array('f')
+        self.pages = array('i')
+        self.font_ids = array('i')
+        self.fonts: List[str] = []
+        self._font_index: Dict[str, int] = {}
+        # O texto do span i é buffer[offsets[i]:offsets[i + 1]]
+        self.offsets = array('q', [0])
+        self._buffer = ""
+        self._pending: List[str] = []
+    
+    @classmethod
+    def from_dicts(cls, font_info: Iterable[Dict[str, Any]]) -> 'SpanStore':
+        """Monta a tabela a partir de dicts no formato antigo de ``font_info``"""
+        store = cls()
+        for info in font_info:
+            x0, y0 = info['posicao'][:2]
+            bbox = info.get('bbox', (x0, y0, x0, y0))
+            store.append(info['text'], info['tamanho'], bbox, info['pagina'], info.get('fonte', ''))
+        return store
+    
+    def append(self, text: str, size: float, bbox: Sequence[float], page: int, font: str):
+        """Adiciona um span (``page`` numerada a partir de 1)"""
+        font_id = self._intern(font)
+        self.sizes.append(size)
+        self.x0.append(bbox[0])
+        self.y0.append(bbox[1])
+        self.x1.append(bbox[2])
+        self.y1.append(bbox[3])
+        self.pages.append(page)
+        self.font_ids.append(font_id)
+        self._pending.append(text)
+        self.offsets.append(self.offsets[-1] + len(text))
+    
+    def extend(self, other: 'SpanStore'):
+        """Anexa todos os spans de outra tabela, remapeando os ids de fonte"""
+        font_map = array('i', (self._intern(font) for font in other.fonts))
+        self.sizes.extend(other.sizes)
+        self.x0.extend(other.x0)
+        self.y0.extend(other.y0)
+        self.x1.extend(other.x1)
+        self.y1.extend(other.y1)
+        self.pages.extend(other.pages)
+        self.font_ids.extend(font_map[font_id] for font_id in other.font_ids)
+        
+        base = self.offsets[-1]
+        self.offsets.extend(base + offset for offset in other.offsets[1:])
+        self._pending.append(other.buffer)
+    
+    def _intern(self, font: str) -> int:
+        font_id = self._font_index.get(font)
+        if font_id is None:
+            font_id = len(self.fonts)
+            self.fonts.append(font)
+            self._font_index[font] = font_id
+        return font_id
+    
+    @property
+    def buffer(self) -> str:
+        """Texto de todos os spans concatenado (consolidado sob demanda)"""
+        if self._pending:
+            self._buffer += ''.join(self._pending)
+            self._pending = []
+        return self._buffer
+    
+    def __len__(self) -> int:
+        return len(self.sizes)
+    
+    def text(self, i: int) -> str:
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]]
+    
+    def font(self, i: int) -> str:
+        return self.fonts[self.font_ids[i]]
+    
+    def bbox(self, i: int) -> Tuple[float, float, float, float]:
+        return (self.x0[i], self.y0[i], self.x1[i], self.y1[i])
+    
+    def texts(self) -> 'SpanTexts':
+        """Visão somente leitura dos textos, sem copiar o buffer"""
+        return SpanTexts(self)
+    
+    def page_indices(self) -> Dict[int, List[int]]:
+        """Agrupa os índices dos spans por página, preservando a ordem"""
+        pages: Dict[int, List[int]] = {}
+        for i, page in enumerate(self.pages):
+            pages.setdefault(page, []).append(i)
+        return pages
+    
+    def select(self, indices: Iterable[int]) -> 'SpanStore':
+        """Nova tabela apenas com os spans informados, na ordem dada"""
+        selected = SpanStore()
+        buffer = self.buffer
+        offsets = self.offsets
+        for i in indices:
+            selected.append(
+                buffer[offsets[i]:offsets[i + 1]],
+                self.sizes[i],
+                (self.x0[i], self.y0[i], self.x1[i], self.y1[i]),
+                self.pages[i],
+                self.fonts[self.font_ids[i]]
+            )
+        return selected
+    
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("índice de span fora do intervalo")
+        return {
+            'text': self.text(i),
+            'tamanho': self.sizes[i],
+            'posicao': (self.x0[i], self.y0[i]),
+            'pagina': self.pages[i],
+            'fonte': self.font(i)
+        }
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SpanStore):
+            return NotImplemented
+        return (
+            self.sizes == other.sizes and self.pages == other.pages
+            and self.x0 == other.x0 and self.y0 == other.y0
+            and self.x1 == other.x1 and self.y1 == other.y1
+            and self.offsets == other.offsets and self.buffer == other.buffer
+            and [self.font(i) for i in range(len(self))] == [other.font(i) for i in range(len(other))]
+        )
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_buffer'] = self.buffer
+        state['_pending'] = []
+        return state
+
+
+class SpanTexts(Sequence):
+    """Sequência dos textos de um SpanStore (substitui a cópia em ``text_blocks``)"""
+    
+    def __init__(self, store: SpanStore):
+        self.store = store
+    
+    def __len__(self) -> int:
+        return len(self.store)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.store.text(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("índice de span fora do intervalo")
+        return self.store.text(i)
+    
+    def __iter__(self) -> Iterator[str]:
+        buffer = self.store.buffer
+        offsets = self.store.offsets
+        for i in range(len(self.store)):
+            yield buffer[offsets[i]:offsets[i + 1]]
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (SpanTexts, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
@@ -8,6 +8,9 @@ from .base_step import BaseStep
 class AdvancedMarkdownConversionStep(BaseStep):
     """Passo responsável por conversão Markdown avançada com múltiplos métodos"""
     
+    requires = ('markdown_content',)
+    provides = ('markdown_content', 'conversion_method', 'all_methods', 'method_chosen')
+    
     def __init__(self):
         super().__init__("AdvancedMarkdownConversion")
     
@@ -7,6 +7,14 @@ from typing import Any, Dict
 class BaseStep(ABC):
     """Classe base abstrata para todos os passos do pipeline"""
     
+    # Incrementar quando uma mudança no passo alterar o resultado produzido
+    version = "1"
+    
+    # Chaves do contexto lidas e escritas pelo passo, usadas pelo escalonador.
+    # None indica que o passo não declarou e deve rodar isolado, como barreira.
+    requires = None
+    provides = None
+    
     def __init__(self, name: str):
         self.name = name
     
@@ -15,6 +23,10 @@ class BaseStep(ABC):
         """Processa os dados e retorna o resultado"""
         pass
     
+    def fingerprint(self) -> str:
+        """Identifica o passo e a configuração que afeta o resultado (usado no cache)"""
+        return f"{self.name}:{self.version}"
+    
     def __str__(self):
         return f"Step: {self.name}"
     
@@ -3,17 +3,74 @@
 import re
 from typing import Dict, Any, List
 from .base_step import BaseStep
+from ..running_lines import RunningLines
+from ..span_store import SpanStore
+from ..text_store import TextStore, DEFAULT_SPILL_THRESHOLD
 
 
 class CleanupStep(BaseStep):
-    """Passo responsável por limpar texto removendo cabeçalhos e rodapés"""
+    """Passo responsável por limpar texto removendo cabeçalhos e rodapés
     
-    def __init__(self):
+    Antes dos padrões por linha, as linhas do topo e da base de cada página
+    que se repetem em muitas páginas (títulos correntes, rodapés do periódico)
+    são removidas de ``font_info``, para não chegarem ao layout e ao Markdown.
+    """
+    
+    version = "2"
+    requires = ('text_blocks', 'font_info')
+    provides = ('text_blocks', 'cleaned_text', 'font_info', 'running_lines')
+    
+    def __init__(self, spill_threshold: int = DEFAULT_SPILL_THRESHOLD):
         super().__init__("Cleanup")
+        # Caracteres de texto limpo mantidos em memória antes de ir para disco
+        self.spill_threshold = spill_threshold
     
     def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Remove cabeçalhos e rodapés do texto extraído"""
         text_blocks = data.get('text_blocks', [])
+        font_info = data.get('font_info')
+        
+        running_lines = []
+        if isinstance(font_info, SpanStore) and len(font_info):
+            detector = RunningLines()
+            dropped = detector.find(font_info)
+            running_lines = detector.running_texts()
+            if dropped:
+                font_info = font_info.select(i for i in range(len(font_info)) if i not in dropped)
+                data['font_info'] = font_info
+                text_blocks = font_info.texts()
+            self.log_info(f"{len(dropped)} spans de {len(running_lines)} cabeçalhos/rodapés repetidos removidos")
+        
+        cleaned_blocks = self.clean_blocks(text_blocks)
+        
+        # Gravar o texto limpo bloco a bloco, no mesmo formato de '\n'.join
+        cleaned_text = TextStore(self.spill_threshold)
+        for i, block in enumerate(cleaned_blocks):
+            cleaned_text.write('\n' + block if i else block)
+        
+        # Atualizar blocos de texto limpos
+        data['text_blocks'] = cleaned_blocks
+        data['cleaned_text'] = cleaned_text
+        data['running_lines'] = running_lines
+        
+        return data
+    
+    def drop_running_lines(self, detector: RunningLines, font_info: SpanStore) -> SpanStore:
+        """Conta as linhas de uma página e remove as já repetidas (modo streaming)
+        
+        As contagens são acumuladas página a página, então só as linhas que já
+        se repetiram nas páginas anteriores são descartadas.
+        """
+        dropped = set()
+        for key, line in detector.update(font_info, range(len(font_info))):
+            if detector.is_running(key):
+                dropped.update(line)
+        if not dropped:
+            return font_info
+        return font_info.select(i for i in range(len(font_info)) if i not in dropped)
+    
+    def clean_blocks(self, text_blocks: List[str]) -> List[str]:
+        """Limpa uma sequência de blocos, descartando os que ficarem vazios"""
         cleaned_blocks = []
         
         for text in text_blocks:
@@ -21,11 +78,7 @@ class CleanupStep(BaseStep):
             if cleaned_text.strip():  # Só adiciona se não estiver vazio
                 cleaned_blocks.append(cleaned_text)
         
-        # Atualizar blocos de texto limpos
-        data['text_blocks'] = cleaned_blocks
-        data['cleaned_text'] = '\n'.join(cleaned_blocks)
-        
-        return data
+        return cleaned_blocks
     
     def _clean_text(self, text: str) -> str:
         """Remove padrões típicos de cabeçalho/rodapé"""
@@ -1,76 +1,110 @@
 """Passo de extração de imagens do PDF"""
 
+import re
 import fitz  # PyMuPDF
-from PIL import Image
-import io
 from pathlib import Path
 from typing import Dict, Any, List
 from .base_step import BaseStep
+from ..document_session import DocumentSession
+from .preflight_step import page_needs
+
+
+# Formatos de extract_image gravados sem recodificar, com a extensão do arquivo
+PASSTHROUGH_FORMATS = {'jpeg': 'jpg', 'jpx': 'jp2', 'png': 'png'}
+
+
+def image_prefix(name: str) -> str:
+    """Prefixo dos arquivos de imagem de um documento, seguro para links Markdown"""
+    return re.sub(r'[^\w.-]+', '_', Path(name).stem) or "documento"
 
 
 class ImageExtractionStep(BaseStep):
-    """Passo responsável por extrair imagens do PDF"""
+    """Passo responsável por extrair imagens do PDF
     
-    def __init__(self, output_dir: str):
+    Os arquivos levam o prefixo do documento (``data['image_prefix']``, por
+    padrão o nome do PDF), pois conversões em lote e no servidor compartilham
+    o mesmo diretório ``images/``.
+    """
+    
+    version = "3"
+    requires = ('pdf_path', 'page_triage', 'image_prefix')
+    provides = ('images',)
+    
+    def __init__(self, output_dir: str, passthrough: bool = True):
         super().__init__("ImageExtraction")
+        # Gravar o fluxo original (JPEG, JPEG 2000, PNG) em vez de decodificar e recodificar
+        self.passthrough = passthrough
         self.output_dir = Path(output_dir)
         self.images_dir = self.output_dir / "images"
         self.images_dir.mkdir(parents=True, exist_ok=True)
     
+    def fingerprint(self) -> str:
+        return f"{super().fingerprint()}:{'passthrough' if self.passthrough else 'png'}"
+    
     def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Extrai imagens do PDF e salva em diretório local"""
-        pdf_path = data.get('pdf_path')
-        if not pdf_path:
-            raise ValueError("pdf_path é obrigatório")
-        
+        # Reutilizar o documento aberto pelo pipeline
+        session = DocumentSession.from_data(data)
+        prefix = data.get('image_prefix') or image_prefix(data['pdf_path'])
         extracted_images = []
         
-        # Abrir o PDF
-        doc = fitz.open(pdf_path)
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Extrair imagens da página
-            image_list = page.get_images()
-            
-            for img_index, img in enumerate(image_list):
-                try:
-                    # Obter dados da imagem
-                    xref = img[0]
-                    pix = fitz.Pixmap(doc, xref)
-                    
-                    if pix.n - pix.alpha < 4:  # Verifica se é RGB ou CMYK
-                        # Converter para RGB se necessário
-                        pix = fitz.Pixmap(fitz.csRGB, pix)
-                    
-                    # Converter para PIL Image
-                    img_data = pix.tobytes("png")
-                    pil_image = Image.open(io.BytesIO(img_data))
-                    
-                    # Salvar imagem
-                    img_filename = f"imagem_p{page_num+1}_{img_index+1}.png"
-                    img_path = self.images_dir / img_filename
-                    pil_image.save(img_path)
-                    
-                    # Adicionar informações da imagem
-                    image_info = {
-                        'pagina': page_num + 1,
-                        'numero': img_index + 1,
-                        'caminho': str(img_path),
-                        'caminho_relativo': f"./images/{img_filename}",
-                        'nome_arquivo': img_filename
-                    }
-                    extracted_images.append(image_info)
-                    
-                    pix = None  # Liberar memória
-                    
-                except Exception as e:
-                    print(f"Erro ao extrair imagem {img_index} da página {page_num + 1}: {e}")
-                    continue
-        
-        doc.close()
+        for page_num in session.page_numbers:
+            if page_needs(data, page_num, 'images'):
+                extracted_images.extend(self.extract_page_images(session, page_num, prefix))
         
         # Adicionar imagens extraídas ao contexto
         data['images'] = extracted_images
         return data
+    
+    def extract_page_images(self, session: DocumentSession, page_num: int,
+                            prefix: str = "imagem") -> List[Dict[str, Any]]:
+        """Extrai e salva as imagens de uma página, com nomes iniciados por ``prefix``"""
+        doc = session.doc
+        page = session.page(page_num)
+        extracted_images = []
+        
+        # Extrair imagens da página
+        image_list = page.get_images()
+        
+        for img_index, img in enumerate(image_list):
+            try:
+                # Obter dados da imagem
+                xref = img[0]
+                img_name = f"{prefix}_p{page_num+1}_{img_index+1}"
+                
+                image = doc.extract_image(xref) if self.passthrough else None
+                extension = PASSTHROUGH_FORMATS.get(image['ext']) if image else None
+                if extension:
+                    # Fluxo original do PDF gravado como está, sem decodificar
+                    img_filename = f"{img_name}.{extension}"
+                    (self.images_dir / img_filename).write_bytes(image['image'])
+                else:
+                    img_filename = f"{img_name}.png"
+                    self.save_pixmap(doc, xref, self.images_dir / img_filename)
+                img_path = self.images_dir / img_filename
+                
+                # Adicionar informações da imagem
+                image_info = {
+                    'pagina': page_num + 1,
+                    'numero': img_index + 1,
+                    'caminho': str(img_path),
+                    'caminho_relativo': f"./images/{img_filename}",
+                    'nome_arquivo': img_filename
+                }
+                extracted_images.append(image_info)
+                
+            except Exception as e:
+                print(f"Erro ao extrair imagem {img_index} da página {page_num + 1}: {e}")
+                continue
+        
+        return extracted_images
+    
+    @staticmethod
+    def save_pixmap(doc: fitz.Document, xref: int, img_path: Path):
+        """Decodifica a imagem e grava como PNG (formatos sem equivalente direto em arquivo)"""
+        pix = fitz.Pixmap(doc, xref)
+        if pix.colorspace is not None and pix.colorspace.n not in (1, 3):
+            # PNG só aceita cinza ou RGB (ex.: CMYK)
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        pix.save(str(img_path))
+        pix = None  # Liberar memória
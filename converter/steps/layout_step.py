@@ -0,0 +1,45 @@
+"""Passo de reconstrução do layout (linhas e blocos) da página"""
+
+from typing import Dict, Any
+from .base_step import BaseStep
+from ..font_profile import FontProfile
+from ..layout import build_layout
+from ..span_store import SpanStore
+
+
+class LayoutStep(BaseStep):
+    """Passo responsável por agrupar os spans extraídos em linhas e blocos
+    
+    A conversão para Markdown passa a receber um bloco por parágrafo ou título,
+    em vez de um parágrafo por span (cada mudança de estilo gerava um). Em
+    páginas com mais de uma coluna, os blocos saem na ordem de leitura (uma
+    coluna inteira antes da outra). O passo também monta o perfil de fontes do
+    documento, usado para os níveis de título.
+    """
+    
+    version = "2"
+    requires = ('font_info',)
+    provides = ('layout', 'font_profile')
+    
+    def __init__(self):
+        super().__init__("Layout")
+    
+    def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Agrupa os spans de cada página em linhas e blocos"""
+        font_info = data.get('font_info')
+        if font_info is None:
+            font_info = SpanStore()
+        elif not isinstance(font_info, SpanStore):
+            font_info = SpanStore.from_dicts(font_info)
+            data['font_info'] = font_info
+        
+        layout = build_layout(font_info)
+        font_profile = FontProfile.from_spans(font_info)
+        self.log_info(
+            f"{len(font_info)} spans agrupados em {len(layout)} blocos; "
+            f"corpo {font_profile.body_size}pt, {len(set(font_profile.levels.values()))} níveis de título"
+        )
+        
+        data['layout'] = layout
+        data['font_profile'] = font_profile
+        return data
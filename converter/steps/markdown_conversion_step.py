@@ -1,47 +1,78 @@
 """Passo de conversão para Markdown"""
 
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from .base_step import BaseStep
 from ..converter import converter_texto, converter_tabela, detectar_titulos, processar_imagem
+from ..font_profile import FontProfile
+from ..layout import build_layout, block_text
+from ..span_store import SpanStore
+from ..text_store import TextStore
 
 
 class MarkdownConversionStep(BaseStep):
     """Passo responsável por converter dados extraídos para Markdown"""
     
-    def __init__(self):
+    version = "4"
+    requires = ('font_info', 'layout', 'font_profile', 'raw_text', 'cleaned_text', 'tables', 'images')
+    provides = ('markdown_content',)
+    
+    def __init__(self, table_page_rows: int = None):
         super().__init__("MarkdownConversion")
+        # Tabelas maiores que isso são divididas em partes com o cabeçalho repetido (None = sem divisão)
+        self.table_page_rows = table_page_rows
+    
+    def fingerprint(self) -> str:
+        return f"{super().fingerprint()}:{self.table_page_rows}"
     
     def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Converte dados extraídos para formato Markdown"""
+        markdown_content = self.convert_parts(
+            data.get('font_info', []),
+            data.get('raw_text', ''),
+            data.get('cleaned_text', ''),
+            data.get('tables', []),
+            data.get('images', []),
+            data.get('layout'),
+            data.get('font_profile')
+        )
+        
+        # Juntar todo o conteúdo
+        final_markdown = '\n\n'.join(markdown_content)
+        
+        # Adicionar markdown final ao contexto
+        data['markdown_content'] = final_markdown
+        return data
+    
+    def convert_parts(self, font_info: SpanStore, raw_text: Union[str, TextStore],
+                      cleaned_text: Union[str, TextStore],
+                      tables: List[Dict[str, Any]], images: List[Dict[str, Any]],
+                      layout: List[Dict[str, Any]] = None,
+                      font_profile: FontProfile = None) -> List[str]:
+        """Converte o conteúdo (documento inteiro ou uma página) em partes de Markdown"""
         markdown_content = []
         
         # Processar informações de fonte para detectar títulos (prioridade)
-        font_info = data.get('font_info', [])
         if font_info:
-            markdown_content.append(self._process_font_info(font_info))
+            markdown_content.append(self._process_font_info(font_info, layout, font_profile))
         else:
             # Fallback: processar texto raw se não houver informações de fonte
-            raw_text = data.get('raw_text', '')
             if raw_text:
-                markdown_content.append(self._process_raw_text(raw_text))
+                markdown_content.append(self._process_raw_text(str(raw_text)))
             else:
                 # Fallback final: processar texto limpo
-                cleaned_text = data.get('cleaned_text', '')
                 if cleaned_text:
-                    markdown_content.append(converter_texto(cleaned_text))
+                    markdown_content.append(converter_texto(str(cleaned_text)))
         
         # Processar tabelas
-        tables = data.get('tables', [])
         for table in tables:
-            table_markdown = converter_tabela(table['dados'])
+            table_markdown = converter_tabela(table['dados'], linhas_por_pagina=self.table_page_rows)
             if table_markdown:
                 markdown_content.append(f"\n## Tabela {table['numero']} (Página {table['pagina']})\n")
                 markdown_content.append(table_markdown)
                 markdown_content.append("\n")
         
         # Processar imagens
-        images = data.get('images', [])
         for image in images:
             image_markdown = processar_imagem(image['caminho'])
             if image_markdown:
@@ -49,44 +80,34 @@ class MarkdownConversionStep(BaseStep):
                 markdown_content.append(image_markdown)
                 markdown_content.append("\n")
         
-        # Juntar todo o conteúdo
-        final_markdown = '\n\n'.join(markdown_content)
-        
-        # Adicionar markdown final ao contexto
-        data['markdown_content'] = final_markdown
-        return data
+        return markdown_content
     
-    def _process_font_info(self, font_info: List[Dict[str, Any]]) -> str:
-        """Processa informações de fonte para detectar títulos"""
-        # Agrupar por página e ordenar por posição
+    def _process_font_info(self, font_info: SpanStore, layout: List[Dict[str, Any]] = None,
+                           font_profile: FontProfile = None) -> str:
+        """Processa os blocos de texto da página para detectar títulos"""
+        if not isinstance(font_info, SpanStore):
+            # Compatibilidade com listas de dicts (checkpoints antigos)
+            font_info = SpanStore.from_dicts(font_info)
+            layout = None
+        
+        # Sem o passo de layout (ex.: chamada direta), agrupar e medir aqui mesmo
+        if layout is None:
+            layout = build_layout(font_info)
+        if font_profile is None:
+            font_profile = FontProfile.from_spans(font_info)
+        
+        # Converter cada bloco em um parágrafo ou título
         pages = {}
-        for info in font_info:
-            page = info['pagina']
-            if page not in pages:
-                pages[page] = []
-            pages[page].append(info)
-        
-        # Ordenar por posição Y (topo para baixo)
-        for page in pages:
-            pages[page].sort(key=lambda x: x['posicao'][1])
-        
-        # Converter para markdown
-        markdown_parts = []
-        for page_num in sorted(pages.keys()):
-            page_content = []
-            for info in pages[page_num]:
-                text = info['text']
-                size = info['tamanho']
-                
-                # Detectar títulos baseado no tamanho da fonte
-                if size >= 14:  # Títulos têm fonte maior
-                    page_content.append(f"# {text}")
-                else:
-                    page_content.append(text)
+        for block in layout:
+            text = block_text(font_info, block)
+            if not text:
+                continue
             
-            if page_content:
-                markdown_parts.append('\n\n'.join(page_content))
+            # Nível do título pelo perfil de fontes do documento (corpo = sem prefixo)
+            text = font_profile.heading_prefix(block['tamanho']) + text
+            pages.setdefault(block['pagina'], []).append(text)
         
+        markdown_parts = ['\n\n'.join(pages[page_num]) for page_num in sorted(pages)]
         return '\n\n'.join(markdown_parts)
     
     def _process_raw_text(self, raw_text: str) -> str:
@@ -8,6 +8,9 @@ from .base_step import BaseStep
 class MarkdownFormattingStep(BaseStep):
     """Passo responsável por melhorar a formatação do Markdown"""
     
+    requires = ('markdown_content',)
+    provides = ('markdown_content',)
+    
     def __init__(self):
         super().__init__("MarkdownFormatting")
     
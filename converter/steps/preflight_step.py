@@ -0,0 +1,113 @@
+"""Passo de triagem prévia das páginas do PDF"""
+
+from collections import Counter
+from typing import Dict, Any
+from .base_step import BaseStep
+from ..document_session import DocumentSession
+
+
+# Tipos de página
+PAGE_TEXT = "text"
+PAGE_IMAGE_ONLY = "image-only"
+PAGE_BLANK = "blank"
+PAGE_VECTOR_HEAVY = "vector-heavy"
+
+# Trabalho que não pode produzir resultado em cada tipo de página
+SKIPPED_WORK = {
+    PAGE_TEXT: (),
+    PAGE_IMAGE_ONLY: ('text', 'tables'),
+    PAGE_BLANK: ('text', 'tables', 'images'),
+    # Tabelas muito pautadas (balanços, planilhas) também passam do limite de desenhos
+    PAGE_VECTOR_HEAVY: (),
+}
+
+
+def page_needs(data: Dict[str, Any], page_num: int, work: str) -> bool:
+    """
+    Indica se um passo deve processar a página, segundo a triagem prévia
+    
+    Args:
+        data: Contexto do pipeline (sem ``page_triage``, todas as páginas são processadas)
+        page_num: Índice da página (a partir de 0)
+        work: 'text', 'tables' ou 'images'
+    """
+    triage = data.get('page_triage')
+    if not triage or page_num not in triage:
+        return True
+    return work not in SKIPPED_WORK[triage[page_num]['tipo']]
+
+
+class PreflightStep(BaseStep):
+    """Passo responsável por classificar as páginas antes da extração
+    
+    Usa ``get_bboxlog()``, que percorre o conteúdo da página uma vez sem montar
+    texto, para contar trechos de texto, imagens e caminhos vetoriais. Páginas
+    em branco ou só com imagens (digitalizadas) não passam pela extração de
+    texto e de tabelas. Páginas com muitos desenhos são marcadas como
+    vetoriais, mas continuam na detecção de tabelas: tabelas densamente
+    pautadas passam facilmente do limite.
+    """
+    
+    requires = ('pdf_path',)
+    provides = ('page_triage',)
+    
+    def __init__(self, vector_threshold: int = 5000):
+        super().__init__("Preflight")
+        # Caminhos vetoriais a partir dos quais a página é marcada como vetorial
+        self.vector_threshold = vector_threshold
+    
+    def fingerprint(self) -> str:
+        return f"{super().fingerprint()}:{self.vector_threshold}"
+    
+    def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Classifica cada página selecionada como texto, só imagem, em branco ou vetorial"""
+        session = DocumentSession.from_data(data)
+        triage = {}
+        
+        for page_num in session.page_numbers:
+            triage[page_num] = self.triage_page(session, page_num)
+            if triage[page_num]['tipo'] == PAGE_BLANK:
+                # Nenhum passo vai ler esta página
+                session.release_page(page_num)
+        
+        counts = Counter(info['tipo'] for info in triage.values())
+        self.log_info(', '.join(f"{count} {tipo}" for tipo, count in sorted(counts.items())) or "nenhuma página")
+        
+        data['page_triage'] = triage
+        return data
+    
+    def triage_page(self, session: DocumentSession, page_num: int) -> Dict[str, Any]:
+        """Conta os elementos desenhados na página e define seu tipo"""
+        page = session.page(page_num)
+        text_count = image_count = vector_count = 0
+        image_area = 0.0
+        
+        for kind, bbox in page.get_bboxlog():
+            if kind.endswith('-text'):
+                # Inclui 'ignore-text' (camada invisível de OCR), que também é extraível
+                text_count += 1
+            elif kind.endswith('-image') or kind.endswith('-imgmask'):
+                image_count += 1
+                image_area += max(0.0, bbox[2] - bbox[0]) * max(0.0, bbox[3] - bbox[1])
+            elif kind.endswith('-path'):
+                vector_count += 1
+        
+        if text_count == 0 and image_count == 0:
+            # Sem texto nem imagens, eventuais traços são apenas decoração
+            page_type = PAGE_BLANK
+        elif text_count == 0 and image_count > 0:
+            page_type = PAGE_IMAGE_ONLY
+        elif vector_count >= self.vector_threshold:
+            page_type = PAGE_VECTOR_HEAVY
+        else:
+            page_type = PAGE_TEXT
+        
+        page_area = page.rect.width * page.rect.height
+        return {
+            'pagina': page_num + 1,
+            'tipo': page_type,
+            'texto': text_count,
+            'imagens': image_count,
+            'vetores': vector_count,
+            'cobertura_imagem': min(1.0, image_area / page_area) if page_area else 0.0
+        }
@@ -8,6 +8,9 @@ from difflib import SequenceMatcher
 from .base_step import BaseStep
 
 class SpellCheckingStep(BaseStep):
+    requires = ('markdown_content',)
+    provides = ('markdown_content', 'spell_corrections')
+    
     def __init__(self):
         super().__init__("SpellChecking")
         
@@ -1,38 +1,256 @@
 """Passo de extração de tabelas do PDF"""
 
-import pdfplumber
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple
 from .base_step import BaseStep
+from ..document_session import DocumentSession
+from ..profiling import current_rss
+from ..table_backends import TableBackend, get_table_backend
+from .preflight_step import page_needs
+
+
+# Comprimento mínimo (pt) de um traço para contar como borda (``edge_min_length`` do pdfplumber)
+MIN_EDGE_LENGTH = 3.0
+# Desvio máximo (pt) para um traço ser considerado horizontal ou vertical
+EDGE_TOLERANCE = 0.5
+# Distância (pt) até a qual bordas próximas pertencem à mesma região
+REGION_GAP = 3.0
+# Margem (pt) acrescentada ao recorte de cada região
+REGION_PADDING = 2.0
+# Acima deste número de bordas a página vira uma única região, sem o agrupamento
+MAX_CLUSTER_EDGES = 2000
 
 
 class TableExtractionStep(BaseStep):
-    """Passo responsável por extrair tabelas do PDF"""
+    """Passo responsável por extrair tabelas do PDF
+    
+    A estratégia padrão do pdfplumber ("lines"), assim como o ``find_tables``
+    do PyMuPDF, só encontra tabelas delimitadas por bordas desenhadas. Antes
+    do mecanismo de tabelas, os traços e retângulos da página são lidos pelo
+    PyMuPDF (bem mais barato) e agrupados em regiões; só as páginas com
+    regiões que têm bordas horizontais e verticais são examinadas, recortadas
+    a essas regiões. Em páginas com bordas demais (tabelas densamente
+    pautadas) o agrupamento é pulado e a região é a que cobre todas as bordas.
+    """
+    
+    version = "3"
+    requires = ('pdf_path', 'page_triage')
+    provides = ('tables', 'table_candidates')
     
-    def __init__(self):
+    def __init__(self, workers: int = 1, engine: str = "pdfplumber"):
         super().__init__("TableExtraction")
+        # Número de processos usados na extração (1 = serial)
+        self.workers = max(1, workers)
+        # Mecanismo de detecção de tabelas ('pdfplumber' ou 'pymupdf')
+        self.backend: TableBackend = get_table_backend(engine)
+    
+    def fingerprint(self) -> str:
+        return f"{super().fingerprint()}:{self.backend.name}"
     
     def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Extrai tabelas do PDF usando pdfplumber"""
-        pdf_path = data.get('pdf_path')
-        if not pdf_path:
-            raise ValueError("pdf_path é obrigatório")
+        """Extrai tabelas do PDF com o mecanismo configurado (pdfplumber ou PyMuPDF)"""
+        # Reutilizar o handle do pdfplumber mantido pela sessão
+        session = DocumentSession.from_data(data)
         
-        extracted_tables = []
+        # Páginas digitalizadas ou em branco ficam fora da detecção de tabelas
+        page_numbers = [n for n in session.page_numbers if page_needs(data, n, 'tables')]
         
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                tables = page.extract_tables()
-                
-                for table_num, table in enumerate(tables):
-                    if table:  # Verifica se a tabela não está vazia
-                        table_info = {
-                            'pagina': page_num + 1,
-                            'numero': table_num + 1,
-                            'dados': table,
-                            'posicao': page.page_number
-                        }
-                        extracted_tables.append(table_info)
+        if self.workers > 1 and len(page_numbers) > 1:
+            extracted_tables, candidates = self._extract_parallel(session, page_numbers)
+        else:
+            extracted_tables, candidates = self.extract_pages(session, page_numbers)
+        
+        selected = sum(1 for info in candidates.values() if info['candidata'])
+        # Pico entre as páginas (e entre os processos, no modo paralelo)
+        peak_rss = max((info['memoria_rss'] or 0 for info in candidates.values()), default=0) or None
+        self.log_info(
+            f"{selected} de {len(candidates)} páginas candidatas a tabelas"
+            + (f"; pico de memória {peak_rss / 1024 / 1024:.1f} MB" if peak_rss else "")
+        )
         
         # Adicionar tabelas extraídas ao contexto
         data['tables'] = extracted_tables
+        data['table_candidates'] = candidates
         return data
+    
+    def extract_pages(self, session: DocumentSession,
+                      page_numbers: List[int]) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+        """Extrai as tabelas das páginas informadas, em ordem, com o handle da sessão
+        
+        Cada página é liberada assim que suas tabelas são extraídas (o
+        pdfplumber guarda os objetos de layout de todas as páginas já lidas),
+        para que a memória não cresça com o número de páginas. A memória
+        residente medida após cada página fica em 'memoria_rss'.
+        """
+        extracted_tables = []
+        candidates = {}
+        for page_num in page_numbers:
+            candidates[page_num] = self.find_candidate_regions(session, page_num)
+            if candidates[page_num]['candidata']:
+                tables = self.extract_page_tables(session, page_num, candidates[page_num]['regioes'])
+                candidates[page_num]['tabelas'] = len(tables)
+                extracted_tables.extend(tables)
+            candidates[page_num]['memoria_rss'] = current_rss()
+            self.backend.release_page(session, page_num)
+            session.release_page(page_num)
+        return extracted_tables, candidates
+    
+    def _extract_parallel(self, session: DocumentSession,
+                          page_numbers: List[int]) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+        """Divide as páginas em faixas contíguas e extrai cada uma em um processo, remontando em ordem"""
+        page_count = len(page_numbers)
+        workers = min(self.workers, page_count)
+        chunk_size = -(-page_count // workers)  # Divisão com arredondamento para cima
+        ranges = [
+            page_numbers[start:start + chunk_size]
+            for start in range(0, page_count, chunk_size)
+        ]
+        
+        self.log_info(f"Extraindo tabelas de {page_count} páginas com {workers} processos")
+        extracted_tables = []
+        candidates = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_extract_table_range, self, session.pdf_path, page_range)
+                for page_range in ranges
+            ]
+            # Os futures são lidos na ordem de submissão, preservando a ordem das páginas e tabelas
+            for future in futures:
+                range_tables, range_candidates = future.result()
+                extracted_tables.extend(range_tables)
+                candidates.update(range_candidates)
+        return extracted_tables, candidates
+    
+    def find_candidate_regions(self, session: DocumentSession, page_num: int) -> Dict[str, Any]:
+        """
+        Agrupa as bordas desenhadas na página em regiões que podem conter tabelas
+        
+        Returns:
+            Dict com 'pagina', 'candidata', 'regioes' (bboxes a recortar, ou
+            None para a página inteira),
+            'bordas_h', 'bordas_v', 'tabelas' e 'memoria_rss'
+        """
+        page = session.page(page_num)
+        edges = self._page_edges(page)
+        
+        if len(edges) > MAX_CLUSTER_EDGES:
+            # O agrupamento compara cada borda com as regiões já formadas; aqui basta uma região
+            clusters = [[
+                min(edge[0] for edge in edges), min(edge[1] for edge in edges),
+                max(edge[2] for edge in edges), max(edge[3] for edge in edges),
+                sum(1 for edge in edges if edge[4] == 'h'), sum(1 for edge in edges if edge[4] == 'v')
+            ]]
+        else:
+            clusters = self._cluster_edges(edges)
+        
+        regions = []
+        for region in clusters:
+            x0, y0, x1, y1, horizontal, vertical = region
+            # Sem ao menos duas bordas em cada direção não há células para o pdfplumber
+            if horizontal >= 2 and vertical >= 2:
+                regions.append((x0 - REGION_PADDING, y0 - REGION_PADDING,
+                                x1 + REGION_PADDING, y1 + REGION_PADDING))
+        regions.sort(key=lambda bbox: (bbox[1], bbox[0]))
+        candidate = bool(regions)
+        
+        if candidate and not self.same_coordinates(session, page_num):
+            # Coordenadas do PyMuPDF e do mecanismo não coincidem: usar a página inteira
+            regions = None
+        
+        return {
+            'pagina': page_num + 1,
+            'candidata': candidate,
+            'regioes': regions,
+            'bordas_h': sum(1 for edge in edges if edge[4] == 'h'),
+            'bordas_v': sum(1 for edge in edges if edge[4] == 'v'),
+            'tabelas': 0,
+            'memoria_rss': None
+        }
+    
+    @staticmethod
+    def _page_edges(page) -> List[Tuple[float, float, float, float, str]]:
+        """Bordas horizontais e verticais (x0, y0, x1, y1, 'h'|'v') dos traços e retângulos"""
+        edges = []
+        
+        def add_segment(x0, y0, x1, y1):
+            x0, x1 = min(x0, x1), max(x0, x1)
+            y0, y1 = min(y0, y1), max(y0, y1)
+            if y1 - y0 <= EDGE_TOLERANCE and x1 - x0 >= MIN_EDGE_LENGTH:
+                edges.append((x0, y0, x1, y1, 'h'))
+            elif x1 - x0 <= EDGE_TOLERANCE and y1 - y0 >= MIN_EDGE_LENGTH:
+                edges.append((x0, y0, x1, y1, 'v'))
+        
+        for path in page.get_drawings():
+            for item in path['items']:
+                if item[0] == 'l':
+                    add_segment(item[1].x, item[1].y, item[2].x, item[2].y)
+                elif item[0] in ('re', 'qu'):
+                    # Retângulos (inclusive só preenchidos) viram quatro bordas, como no pdfplumber
+                    rect = item[1] if item[0] == 're' else item[1].rect
+                    add_segment(rect.x0, rect.y0, rect.x1, rect.y0)
+                    add_segment(rect.x0, rect.y1, rect.x1, rect.y1)
+                    add_segment(rect.x0, rect.y0, rect.x0, rect.y1)
+                    add_segment(rect.x1, rect.y0, rect.x1, rect.y1)
+        return edges
+    
+    @staticmethod
+    def _cluster_edges(edges: List[Tuple[float, float, float, float, str]]) -> List[List[float]]:
+        """Junta bordas que se tocam (até ``REGION_GAP``) em regiões [x0, y0, x1, y1, h, v]"""
+        regions = []
+        for x0, y0, x1, y1, orientation in sorted(edges, key=lambda edge: edge[1]):
+            merged = [x0, y0, x1, y1, int(orientation == 'h'), int(orientation == 'v')]
+            changed = True
+            while changed:
+                # Ao crescer, a região pode passar a tocar outras já percorridas
+                changed = False
+                remaining = []
+                for region in regions:
+                    if (region[0] - REGION_GAP <= merged[2] and merged[0] <= region[2] + REGION_GAP
+                            and region[1] - REGION_GAP <= merged[3] and merged[1] <= region[3] + REGION_GAP):
+                        merged = [
+                            min(merged[0], region[0]), min(merged[1], region[1]),
+                            max(merged[2], region[2]), max(merged[3], region[3]),
+                            merged[4] + region[4], merged[5] + region[5]
+                        ]
+                        changed = True
+                    else:
+                        remaining.append(region)
+                regions = remaining
+            regions.append(merged)
+        return regions
+    
+    def same_coordinates(self, session: DocumentSession, page_num: int) -> bool:
+        """Indica se as bboxes do mecanismo nesta página estão nas coordenadas dos spans do PyMuPDF"""
+        if self.backend.fitz_coordinates:
+            return True
+        page = session.page(page_num)
+        return not page.rotation and page.cropbox == page.mediabox
+    
+    def extract_page_tables(self, session: DocumentSession, page_num: int,
+                            regions: List[Any] = None) -> List[Dict[str, Any]]:
+        """Extrai as tabelas de uma página com o mecanismo configurado, opcionalmente só nas regiões informadas"""
+        extracted_tables = []
+        tables = self.backend.extract(session, page_num, regions)
+        # Sem coordenadas comuns (ex.: pdfplumber em página girada) a tabela não serve para mascarar o texto
+        same_coordinates = self.same_coordinates(session, page_num)
+        
+        for table_num, (bbox, table) in enumerate(tables):
+            if table:  # Verifica se a tabela não está vazia
+                table_info = {
+                    'pagina': page_num + 1,
+                    'numero': table_num + 1,
+                    'dados': table,
+                    'posicao': page_num + 1,
+                    'bbox': bbox if same_coordinates else None
+                }
+                extracted_tables.append(table_info)
+        
+        return extracted_tables
+
+
+def _extract_table_range(step: TableExtractionStep, pdf_path: str,
+                         page_range: List[int]) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """Extrai as tabelas de uma faixa de páginas em um processo separado, com handle próprio"""
+    # O pdfplumber do processo carrega apenas as páginas da faixa
+    with DocumentSession(pdf_path, [page_num + 1 for page_num in page_range]) as session:
+        return step.extract_pages(session, page_range)
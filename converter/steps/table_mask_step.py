@@ -0,0 +1,119 @@
+"""Passo que remove do texto os spans que já estão nas tabelas"""
+
+from collections import Counter
+from typing import Dict, Any, Iterator, List, Sequence, Tuple, Union
+from .base_step import BaseStep
+from ..layout import group_lines, line_text
+from ..span_store import SpanStore
+from ..text_store import TextStore, DEFAULT_SPILL_THRESHOLD
+
+
+# Folga (pt) ao redor da bbox da tabela
+MASK_TOLERANCE = 1.0
+
+
+class TableMaskStep(BaseStep):
+    """Passo responsável por mascarar o texto das tabelas extraídas
+    
+    O texto de uma tabela chega duas vezes: como spans soltos da extração de
+    texto e como células da extração de tabelas. Os spans cujo centro cai
+    dentro da bbox de uma tabela da mesma página saem de ``font_info``,
+    ``text_blocks`` e ``raw_text``, e a tabela aparece uma vez só no Markdown.
+    Só as páginas com spans mascarados têm o texto bruto refeito; as demais
+    mantêm o texto da extração.
+    """
+    
+    version = "2"
+    requires = ('font_info', 'raw_text', 'raw_text_pages', 'tables')
+    provides = ('font_info', 'text_blocks', 'raw_text', 'raw_text_pages')
+    
+    def __init__(self, spill_threshold: int = DEFAULT_SPILL_THRESHOLD):
+        super().__init__("TableMask")
+        # Caracteres de texto bruto mantidos em memória antes de ir para disco
+        self.spill_threshold = spill_threshold
+    
+    def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Remove os spans cobertos pelas tabelas e refaz o texto bruto"""
+        font_info = data.get('font_info')
+        tables = data.get('tables', [])
+        if not isinstance(font_info, SpanStore) or not tables:
+            return data
+        
+        masked_info, masked = self.mask_spans(font_info, tables)
+        self.log_info(f"{masked} spans dentro de {len(tables)} tabelas removidos do texto")
+        if not masked:
+            return data
+        
+        # Páginas que perderam spans; o texto delas é refeito com os spans restantes
+        kept = Counter(masked_info.pages)
+        masked_pages = {page for page, count in Counter(font_info.pages).items() if kept[page] != count}
+        page_indices = masked_info.page_indices()
+        
+        raw_text = TextStore(self.spill_threshold)
+        raw_text_pages = []
+        for page, text in self.page_segments(data['raw_text'], data['raw_text_pages']):
+            if page in masked_pages:
+                # No formato da extração (páginas separadas por "\n\n")
+                text = self.page_text(masked_info, page_indices.get(page, []))
+                text = text + "\n\n" if text.strip() else ""
+            if text:
+                raw_text_pages.append((page, raw_text.write(text)))
+        
+        data['font_info'] = masked_info
+        data['text_blocks'] = masked_info.texts()
+        data['raw_text'] = raw_text
+        data['raw_text_pages'] = raw_text_pages
+        return data
+    
+    @staticmethod
+    def page_segments(raw_text: Union[str, TextStore],
+                      page_lengths: Sequence[Tuple[int, int]]) -> Iterator[Tuple[int, str]]:
+        """Divide o texto bruto nos trechos de cada página, lendo-o em blocos"""
+        chunks = raw_text.iter_chunks() if isinstance(raw_text, TextStore) else iter([raw_text])
+        buffer, position = "", 0
+        for page, length in page_lengths:
+            while len(buffer) - position < length:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                buffer = buffer[position:] + chunk
+                position = 0
+            yield page, buffer[position:position + length]
+            position += length
+    
+    @staticmethod
+    def mask_spans(spans: SpanStore, tables: Sequence[Dict[str, Any]]) -> Tuple[SpanStore, int]:
+        """
+        Remove os spans cujo centro está dentro de alguma tabela da mesma página
+        
+        Returns:
+            Tupla (tabela de spans sem o texto das tabelas, número de spans removidos)
+        """
+        boxes: Dict[int, List[Tuple[float, float, float, float]]] = {}
+        for table in tables:
+            if table.get('bbox') is not None:
+                boxes.setdefault(table['pagina'], []).append(table['bbox'])
+        if not boxes:
+            return spans, 0
+        
+        x0, y0, x1, y1, pages = spans.x0, spans.y0, spans.x1, spans.y1, spans.pages
+        kept = []
+        for i in range(len(spans)):
+            page_boxes = boxes.get(pages[i])
+            if page_boxes:
+                cx = (x0[i] + x1[i]) / 2
+                cy = (y0[i] + y1[i]) / 2
+                if any(bx0 - MASK_TOLERANCE <= cx <= bx1 + MASK_TOLERANCE
+                       and by0 - MASK_TOLERANCE <= cy <= by1 + MASK_TOLERANCE
+                       for bx0, by0, bx1, by1 in page_boxes):
+                    continue
+            kept.append(i)
+        
+        if len(kept) == len(spans):
+            return spans, 0
+        return spans.select(kept), len(spans) - len(kept)
+    
+    @staticmethod
+    def page_text(spans: SpanStore, indices: List[int]) -> str:
+        """Texto de uma página montado linha a linha a partir dos spans"""
+        return ''.join(line_text(spans, line) + "\n" for line in group_lines(spans, indices))
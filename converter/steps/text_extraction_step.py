@@ -1,92 +1,131 @@
 """Passo de extração de texto do PDF"""
 
-import fitz  # PyMuPDF
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterator, List, Tuple
 from .base_step import BaseStep
+from ..document_session import DocumentSession
+from ..span_store import SpanStore
+from ..text_store import TextStore, DEFAULT_SPILL_THRESHOLD
+from .preflight_step import page_needs
 
 
 class TextExtractionStep(BaseStep):
     """Passo responsável por extrair texto do PDF com informações de fonte"""
     
-    def __init__(self):
+    version = "4"
+    requires = ('pdf_path', 'page_triage')
+    provides = ('text_blocks', 'font_info', 'total_pages', 'raw_text', 'raw_text_pages')
+    
+    def __init__(self, workers: int = 1, spill_threshold: int = DEFAULT_SPILL_THRESHOLD):
         super().__init__("TextExtraction")
+        # Número de processos usados na extração (1 = serial)
+        self.workers = max(1, workers)
+        # Caracteres de texto bruto mantidos em memória antes de ir para disco
+        self.spill_threshold = spill_threshold
     
     def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Extrai texto do PDF com informações de fonte e posição"""
-        pdf_path = data.get('pdf_path')
-        if not pdf_path:
-            raise ValueError("pdf_path é obrigatório")
+        # Reutilizar o documento aberto pelo pipeline
+        session = DocumentSession.from_data(data)
         
-        # Abrir o PDF
-        doc = fitz.open(pdf_path)
-        extracted_data = {
-            'text_blocks': [],
-            'font_info': [],
-            'total_pages': len(doc),
-            'raw_text': ""
-        }
+        # Páginas em branco ou só com imagens não têm texto a extrair
+        page_numbers = [n for n in session.page_numbers if page_needs(data, n, 'text')]
+        
+        spans = SpanStore()
+        if self.workers > 1 and len(page_numbers) > 1:
+            page_texts = self._extract_parallel(session, page_numbers, spans)
+        else:
+            page_texts = self._extract_serial(session, page_numbers, spans)
         
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Tentar diferentes métodos de extração
-            page_text = ""
-            
-            # Método 1: Extração simples
-            try:
-                page_text = page.get_text()
-            except:
-                pass
-            
-            # Método 2: Extração com HTML (às vezes funciona melhor)
-            if not page_text.strip():
-                try:
-                    page_text = page.get_text("html")
-                    # Limpar tags HTML
-                    import re
-                    page_text = re.sub(r'<[^>]+>', '', page_text)
-                except:
-                    pass
-            
-            # Método 3: Extração por blocos
-            if not page_text.strip():
-                try:
-                    blocks = page.get_text("dict")
-                    page_text = ""
-                    for block in blocks.get("blocks", []):
-                        if "lines" in block:
-                            for line in block["lines"]:
-                                for span in line["spans"]:
-                                    page_text += span['text'] + " "
-                except:
-                    pass
-            
+        # Acumular os textos na ordem das páginas, sem montar uma string única
+        raw_text = TextStore(self.spill_threshold)
+        # (página, caracteres) de cada trecho do texto bruto, para refazer só páginas específicas
+        raw_text_pages = []
+        for page_num, page_text in zip(page_numbers, page_texts):
             if page_text.strip():
-                extracted_data['raw_text'] += page_text + "\n\n"
-            
-            # Extrair informações de fonte para detecção de títulos
-            try:
-                blocks = page.get_text("dict")
-                for block in blocks.get("blocks", []):
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            for span in line["spans"]:
-                                # Filtrar texto muito pequeno ou vazio
-                                if len(span['text'].strip()) > 0 and span['size'] > 6:
-                                    font_info = {
-                                        'text': span['text'],
-                                        'tamanho': span['size'],
-                                        'posicao': (span['bbox'][0], span['bbox'][1]),
-                                        'pagina': page_num + 1,
-                                        'fonte': span['font']
-                                    }
-                                    extracted_data['font_info'].append(font_info)
-                                    extracted_data['text_blocks'].append(span['text'])
-            except:
-                pass
+                raw_text_pages.append((page_num + 1, raw_text.write(page_text + "\n\n")))
         
-        doc.close()
+        extracted_data = {
+            # text_blocks é uma visão dos textos da tabela de spans, sem cópia
+            'text_blocks': spans.texts(),
+            'font_info': spans,
+            'total_pages': len(session.page_numbers),
+            'raw_text': raw_text,
+            'raw_text_pages': raw_text_pages
+        }
         
         # Adicionar dados extraídos ao contexto
         data.update(extracted_data)
         return data
+    
+    def _extract_serial(self, session: DocumentSession, page_numbers: List[int],
+                        spans: SpanStore) -> Iterator[str]:
+        """Extrai as páginas em sequência, liberando o dict e a página de cada uma em seguida"""
+        for page_num in page_numbers:
+            page_text = self.extract_page(session, page_num, spans)
+            # Sem isso a sessão manteria os dicts de todas as páginas até o fim da conversão
+            # (liberada antes do yield: quem consome pode não retomar o gerador após a última página)
+            session.release_page(page_num)
+            yield page_text
+    
+    def _extract_parallel(self, session: DocumentSession, page_numbers: List[int],
+                          spans: SpanStore) -> Iterator[str]:
+        """Divide as páginas em faixas contíguas, extrai cada uma em um processo e produz os textos em ordem"""
+        page_count = len(page_numbers)
+        workers = min(self.workers, page_count)
+        chunk_size = -(-page_count // workers)  # Divisão com arredondamento para cima
+        ranges = [
+            page_numbers[start:start + chunk_size]
+            for start in range(0, page_count, chunk_size)
+        ]
+        
+        self.log_info(f"Extraindo {page_count} páginas com {workers} processos")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_extract_page_range, session.pdf_path, page_range)
+                for page_range in ranges
+            ]
+            # Os futures são lidos na ordem de submissão, preservando a ordem das páginas
+            for future in futures:
+                range_texts, range_spans = future.result()
+                spans.extend(range_spans)
+                yield from range_texts
+    
+    @staticmethod
+    def extract_page(session: DocumentSession, page_num: int, spans: SpanStore) -> str:
+        """Extrai o texto de uma página e adiciona seus spans à tabela ``spans``
+        
+        A página é lida uma única vez (``get_text("dict")`` só com texto) e o
+        texto bruto é montado no mesmo percurso, linha a linha, como em ``get_text()``.
+        """
+        lines = []
+        try:
+            blocks = session.page_dict(page_num)
+        except Exception:
+            return ""
+        
+        page_number = page_num + 1
+        for block in blocks.get("blocks", []):
+            for line in block.get("lines", ()):
+                line_parts = []
+                for span in line["spans"]:
+                    text = span['text']
+                    line_parts.append(text)
+                    # Filtrar texto muito pequeno ou vazio
+                    if span['size'] > 6 and text.strip():
+                        spans.append(text, span['size'], span['bbox'], page_number, span['font'])
+                lines.append(''.join(line_parts))
+        
+        return ''.join(line + "\n" for line in lines)
+
+
+def _extract_page_range(pdf_path: str, page_range: List[int]) -> Tuple[List[str], SpanStore]:
+    """Extrai uma faixa de páginas em um processo separado, com handle próprio"""
+    with DocumentSession(pdf_path) as session:
+        page_texts = []
+        spans = SpanStore()
+        for page_num in page_range:
+            page_texts.append(TextExtractionStep.extract_page(session, page_num, spans))
+            # Cada página é lida uma só vez neste processo
+            session.release_page(page_num)
+        return page_texts, spans
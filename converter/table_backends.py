@@ -0,0 +1,105 @@
+"""Mecanismos de detecção de tabelas (pdfplumber ou PyMuPDF)"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import fitz
+
+from .document_session import DocumentSession
+
+
+Region = Tuple[float, float, float, float]
+Table = List[List[Optional[str]]]
+
+
+class TableBackend(ABC):
+    """Interface dos mecanismos de tabelas usados por ``TableExtractionStep``
+    
+    Cada mecanismo lê a página pela sessão compartilhada e devolve, para cada
+    tabela, sua bbox e as linhas de células (``None`` em células vazias ou
+    mescladas), no formato de ``extract_tables`` do pdfplumber.
+    """
+    
+    name = "base"
+    # Regiões e bboxes sempre nas coordenadas do PyMuPDF (as dos spans), inclusive
+    # em páginas giradas ou com cropbox diferente do mediabox
+    fitz_coordinates = False
+    
+    @abstractmethod
+    def extract(self, session: DocumentSession, page_num: int,
+                regions: Optional[Sequence[Region]] = None) -> List[Tuple[Region, Table]]:
+        """Pares (bbox, linhas) das tabelas da página (índice a partir de 0), só nas regiões informadas ou na página inteira"""
+        pass
+    
+    def release_page(self, session: DocumentSession, page_num: int):
+        """Libera o que o mecanismo mantém em cache para a página"""
+
+
+class PdfplumberBackend(TableBackend):
+    """Tabelas pelo pdfplumber (estratégia "lines"), em um segundo parse do PDF"""
+    
+    name = "pdfplumber"
+    
+    def extract(self, session: DocumentSession, page_num: int,
+                regions: Optional[Sequence[Region]] = None) -> List[Tuple[Region, Table]]:
+        page = session.plumber_page(page_num)
+        if regions is None:
+            return self._page_tables(page)
+        
+        tables = []
+        px0, ptop, px1, pbottom = page.bbox
+        for x0, y0, x1, y1 in regions:
+            bbox = (max(x0, px0), max(y0, ptop), min(x1, px1), min(y1, pbottom))
+            if bbox[0] < bbox[2] and bbox[1] < bbox[3]:
+                cropped = page.crop(bbox)
+                tables.extend(self._page_tables(cropped))
+                cropped.close()  # O recorte guarda sua própria cópia dos objetos da página
+        return tables
+    
+    @staticmethod
+    def _page_tables(page) -> List[Tuple[Region, Table]]:
+        # Equivale a page.extract_tables(), mantendo a bbox de cada tabela
+        return [(tuple(table.bbox), table.extract()) for table in page.find_tables()]
+    
+    def release_page(self, session: DocumentSession, page_num: int):
+        session.release_plumber_page(page_num)
+
+
+class PyMuPDFBackend(TableBackend):
+    """Tabelas pelo ``find_tables`` do PyMuPDF, reaproveitando o documento já aberto"""
+    
+    name = "pymupdf"
+    fitz_coordinates = True
+    
+    def extract(self, session: DocumentSession, page_num: int,
+                regions: Optional[Sequence[Region]] = None) -> List[Tuple[Region, Table]]:
+        page = session.page(page_num)
+        # find_tables trabalha na página girada; spans e desenhos, na página sem rotação
+        clips = [None] if regions is None else [
+            fitz.Rect(region) * page.rotation_matrix & page.rect for region in regions
+        ]
+        
+        tables = []
+        for clip in clips:
+            if clip is not None and clip.is_empty:
+                continue
+            for table in page.find_tables(clip=clip).tables:
+                bbox = fitz.Rect(table.bbox) * page.derotation_matrix
+                tables.append((tuple(bbox), table.extract()))
+        return tables
+
+
+TABLE_BACKENDS: Dict[str, type] = {
+    PdfplumberBackend.name: PdfplumberBackend,
+    PyMuPDFBackend.name: PyMuPDFBackend,
+}
+
+
+def get_table_backend(name: str) -> TableBackend:
+    """Instancia o mecanismo de tabelas pelo nome ('pdfplumber' ou 'pymupdf')"""
+    try:
+        return TABLE_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Mecanismo de tabelas desconhecido: {name!r} (opções: {', '.join(TABLE_BACKENDS)})"
+        ) from None
@@ -0,0 +1,77 @@
+"""Renderização de tabelas em Markdown linha a linha"""
+
+from typing import Any, Iterable, Iterator, List, Optional, TextIO
+
+
+def _cell(value: Any) -> str:
+    """Célula como texto de uma linha: None vira vazio, quebras viram espaço e '|' é escapado"""
+    if value is None:
+        return ""
+    text = str(value)
+    if '\n' in text or '\r' in text:
+        text = ' '.join(text.split())
+    return text.replace('|', '\\|')
+
+
+def _row(cells: Iterable[Any], width: int) -> str:
+    """Linha Markdown com exatamente ``width`` colunas"""
+    row = [_cell(cell) for cell in cells]
+    if len(row) < width:
+        row.extend([""] * (width - len(row)))
+    elif len(row) > width:
+        # Células excedentes vão para a última coluna, sem perder conteúdo
+        row[width - 1:] = [' '.join(cell for cell in row[width - 1:] if cell)]
+    return "| " + " | ".join(row) + " |"
+
+
+def iter_table_lines(rows: Iterable[Iterable[Any]], max_rows: Optional[int] = None,
+                     page_rows: Optional[int] = None) -> Iterator[str]:
+    """
+    Produz as linhas Markdown de uma tabela, sem montar a tabela inteira
+    
+    A primeira linha é o cabeçalho e define o número de colunas; linhas mais
+    curtas são completadas e as mais longas têm o excedente juntado na última
+    coluna.
+    
+    Args:
+        rows: Linhas de células (qualquer iterável, inclusive um gerador)
+        max_rows: Máximo de linhas de dados; as demais viram uma nota de linhas omitidas
+        page_rows: Repete o cabeçalho, em uma nova tabela, a cada ``page_rows`` linhas de dados
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    
+    header = list(header)
+    width = max(1, len(header))
+    header_lines = (_row(header, width), "|" + "|".join(["---"] * width) + "|")
+    yield from header_lines
+    
+    written = 0
+    for row in rows:
+        if max_rows is not None and written >= max_rows:
+            omitted = 1 + sum(1 for _ in rows)
+            yield ""
+            yield f"*... {omitted} linhas omitidas*"
+            return
+        if page_rows and written and written % page_rows == 0:
+            yield ""
+            yield from header_lines
+        yield _row(row, width)
+        written += 1
+
+
+def write_table(rows: Iterable[Iterable[Any]], out: TextIO, **options) -> int:
+    """Escreve a tabela em ``out`` linha a linha e retorna o número de caracteres escritos"""
+    written = 0
+    for index, line in enumerate(iter_table_lines(rows, **options)):
+        if index:
+            written += out.write("\n")
+        written += out.write(line)
+    return written
+
+
+def render_table(rows: List[List[Any]], **options) -> str:
+    """Tabela Markdown como uma única string (montada com um único join)"""
+    return "\n".join(iter_table_lines(rows, **options))
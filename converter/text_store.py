@@ -0,0 +1,148 @@
+"""Buffer de texto que transborda para disco em documentos muito grandes"""
+
+import codecs
+import mmap
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+
+DEFAULT_SPILL_THRESHOLD = 64 * 1024 * 1024  # caracteres mantidos em memória
+CHUNK_SIZE = 1024 * 1024
+
+
+class TextStore:
+    """Texto acumulado em blocos, em memória até ``spill_threshold`` caracteres
+    
+    Acima do limite, o conteúdo passa para um arquivo temporário (UTF-8) e as
+    leituras são feitas por ``mmap``, em blocos. Os passos escrevem com
+    ``write`` e leem com ``iter_chunks`` ou iterando linha a linha, como em um
+    arquivo, sem manter o documento inteiro em uma única string. ``getvalue``
+    (ou ``str``) materializa o texto para quem ainda precisa dele inteiro.
+    """
+    
+    def __init__(self, spill_threshold: int = DEFAULT_SPILL_THRESHOLD, spill_dir: str = None):
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        self._chunks: List[str] = []
+        self._memory_size = 0
+        self._length = 0
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+    
+    @property
+    def spilled(self) -> bool:
+        """Indica se o conteúdo já foi transferido para disco"""
+        return self._file is not None
+    
+    def write(self, text: str) -> int:
+        """Acrescenta texto ao final do buffer"""
+        if not text:
+            return 0
+        self._length += len(text)
+        if self._file is not None:
+            self._file.write(text.encode('utf-8'))
+        else:
+            self._chunks.append(text)
+            self._memory_size += len(text)
+            if self._memory_size > self.spill_threshold:
+                self._spill()
+        return len(text)
+    
+    def writelines(self, texts: Iterable[str]):
+        for text in texts:
+            self.write(text)
+    
+    def _spill(self):
+        """Move os blocos em memória para um arquivo temporário"""
+        self._file = tempfile.TemporaryFile(prefix="pdf_to_markdown_", suffix=".txt", dir=self.spill_dir)
+        for chunk in self._chunks:
+            self._file.write(chunk.encode('utf-8'))
+        self._chunks = []
+        self._memory_size = 0
+    
+    def _view(self) -> Optional[mmap.mmap]:
+        """Mapeia o arquivo para leitura, refazendo o mapa se ele cresceu"""
+        self._file.flush()
+        size = os.fstat(self._file.fileno()).st_size
+        if self._mmap is not None and len(self._mmap) != size:
+            self._mmap.close()
+            self._mmap = None
+        if self._mmap is None and size:
+            self._mmap = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        return self._mmap
+    
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Percorre o texto em blocos, sem materializá-lo inteiro"""
+        if self._file is None:
+            yield from list(self._chunks)
+            return
+        
+        view = self._view()
+        if view is None:
+            return
+        # Decodificador incremental: um bloco pode cortar um caractere UTF-8 ao meio
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for start in range(0, len(view), chunk_size):
+            text = decoder.decode(view[start:start + chunk_size])
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+    
+    def __iter__(self) -> Iterator[str]:
+        """Percorre o texto linha a linha, mantendo as quebras de linha"""
+        pending = ""
+        for chunk in self.iter_chunks():
+            lines = (pending + chunk).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if pending:
+            yield pending
+    
+    def getvalue(self) -> str:
+        """Retorna o texto inteiro como uma única string"""
+        if self._file is None:
+            if len(self._chunks) > 1:
+                self._chunks = [''.join(self._chunks)]
+            return self._chunks[0] if self._chunks else ""
+        return ''.join(self.iter_chunks())
+    
+    def __str__(self) -> str:
+        return self.getvalue()
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TextStore, str)):
+            return len(self) == len(other) and self.getvalue() == str(other)
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def close(self):
+        """Fecha o arquivo temporário (removido automaticamente pelo sistema)"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._chunks = []
+        self._memory_size = 0
+        self._length = 0
+    
+    def __getstate__(self):
+        # O arquivo temporário não pode ser serializado: levar o texto em blocos
+        return {
+            'spill_threshold': self.spill_threshold,
+            'spill_dir': self.spill_dir,
+            'chunks': list(self.iter_chunks())
+        }
+    
+    def __setstate__(self, state):
+        self.__init__(state['spill_threshold'], state['spill_dir'])
+        self.writelines(state['chunks'])
@@ -9,10 +9,17 @@ import sys
 from pathlib import Path
 
 from converter.pipeline import ConversionPipeline
+from converter.batch import find_pdfs, convert_batch
+from converter.cache import ConversionCache, DEFAULT_CACHE_DIR
+from converter.document_session import parse_page_ranges
+from converter.table_backends import TABLE_BACKENDS
 
 
 def main():
     """Função principal da CLI"""
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        sys.exit(serve_main(sys.argv[2:]))
+    
     parser = argparse.ArgumentParser(
         description="Conversor de PDF para Markdown - Artigos Científicos",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -21,12 +28,20 @@ Exemplos de uso:
   python main.py artigo.pdf
   python main.py artigo.pdf -o artigo_convertido.md
   python main.py artigo.pdf -d output/personalizado
+  python main.py livro.pdf --workers 8
+  python main.py livro.pdf --stream
+  python main.py livro.pdf --pages 1-10,50-60
+  python main.py pasta_de_pdfs/ --jobs 16
+  python main.py "arquivo/**/*.pdf" --jobs 32
+  python main.py artigo.pdf --checkpoint-dir .checkpoints
+  python main.py artigo.pdf --checkpoint-dir .checkpoints --from-step MarkdownConversion
+  python main.py serve --port 8765 --pool-size 8
         """
     )
     
     parser.add_argument(
         'pdf_file',
-        help='Caminho para o arquivo PDF a ser convertido'
+        help='Arquivo PDF, diretório ou padrão glob com os PDFs a converter'
     )
     
     parser.add_argument(
@@ -40,16 +55,121 @@ Exemplos de uso:
         help='Diretório de saída (padrão: output)'
     )
     
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Número de processos para extração de texto e de tabelas em paralelo (padrão: 1)'
+    )
+    
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Número de documentos convertidos em paralelo no modo lote (padrão: 1)'
+    )
+    
+    parser.add_argument(
+        '--concurrent-steps',
+        action='store_true',
+        help='Executar passos independentes (ex.: tabelas e imagens) em paralelo com a extração de texto'
+    )
+    
+    parser.add_argument(
+        '--pages',
+        help='Converter apenas as páginas informadas, a partir de 1 (ex.: 1-10,50-60 ou 100-)'
+    )
+    
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Converter página a página, gravando o Markdown incrementalmente'
+    )
+    
+    parser.add_argument(
+        '--checkpoint-dir',
+        help='Salvar o estado do pipeline após cada passo neste diretório'
+    )
+    
+    parser.add_argument(
+        '--from-step',
+        help='Retomar a partir do passo informado (ex.: MarkdownConversion) usando os checkpoints'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Não usar o cache de conversões (sempre reconverter)'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=str(DEFAULT_CACHE_DIR),
+        help=f'Diretório do cache de conversões (padrão: {DEFAULT_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=2048,
+        help='Tamanho máximo do cache em MB; as entradas menos usadas são removidas (padrão: 2048)'
+    )
+    
+    parser.add_argument(
+        '--spill-threshold',
+        type=int,
+        default=64,
+        help='Texto bruto e limpo acima deste tamanho (em milhões de caracteres) vai para arquivos temporários (padrão: 64)'
+    )
+    
+    parser.add_argument(
+        '--table-page-rows',
+        type=int,
+        help='Dividir tabelas com mais linhas que isso em partes com o cabeçalho repetido'
+    )
+    
+    parser.add_argument(
+        '--table-engine',
+        choices=sorted(TABLE_BACKENDS),
+        default='pdfplumber',
+        help='Mecanismo de detecção de tabelas (padrão: pdfplumber; pymupdf reaproveita o documento já aberto)'
+    )
+    
+    parser.add_argument(
+        '--no-image-passthrough',
+        action='store_true',
+        help='Recodificar todas as imagens em PNG em vez de gravar o fluxo original (JPEG, JPEG 2000, PNG)'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
         help='Modo verboso (mais informações de debug)'
     )
     
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Medir tempo e pico de memória de cada passo do pipeline'
+    )
+    
     args = parser.parse_args()
     
-    # Validar arquivo de entrada
+    if args.from_step and not args.checkpoint_dir:
+        parser.error("--from-step requer --checkpoint-dir")
+    
+    if args.pages is not None:
+        try:
+            parse_page_ranges(args.pages)
+        except ValueError as e:
+            parser.error(f"--pages: {e}")
+    
+    # Diretório ou glob: modo lote
     pdf_path = Path(args.pdf_file)
+    if pdf_path.is_dir() or (not pdf_path.exists() and any(c in args.pdf_file for c in '*?[')):
+        sys.exit(run_batch(args))
+    
+    # Validar arquivo de entrada
     if not pdf_path.exists():
         print(f"Erro: Arquivo não encontrado: {pdf_path}")
         sys.exit(1)
@@ -58,15 +178,32 @@ Exemplos de uso:
         print(f"Erro: Arquivo deve ser um PDF: {pdf_path}")
         sys.exit(1)
     
+    pipeline = None
     try:
         # Criar pipeline de conversão
-        pipeline = ConversionPipeline(args.output_dir)
+        pipeline = ConversionPipeline(
+            args.output_dir,
+            workers=args.workers,
+            profile=args.profile,
+            cache=build_cache(args),
+            checkpoint_dir=args.checkpoint_dir,
+            concurrent_steps=args.concurrent_steps,
+            spill_threshold=args.spill_threshold * 1024 * 1024,
+            table_engine=args.table_engine,
+            table_page_rows=args.table_page_rows,
+            image_passthrough=not args.no_image_passthrough
+        )
         
         # Executar conversão
-        output_path = pipeline.convert(
-            str(pdf_path),
-            args.output
-        )
+        if args.stream:
+            output_path = pipeline.convert_stream(str(pdf_path), args.output, pages=args.pages)
+        else:
+            output_path = pipeline.convert(
+                str(pdf_path),
+                args.output,
+                from_step=args.from_step,
+                pages=args.pages
+            )
         
         print(f"\n✅ Conversão concluída com sucesso!")
         print(f"📄 Arquivo Markdown: {output_path}")
@@ -78,6 +215,10 @@ Exemplos de uso:
             print(f"   - Páginas processadas: {stats['total_pages']}")
             print(f"   - Blocos de texto: {stats['text_blocks']}")
             print(f"   - Tabelas extraídas: {stats['tables']}")
+            candidates = stats.get('table_candidates', [])
+            print(f"   - Páginas candidatas a tabelas: {sum(1 for info in candidates if info['candidata'])} de {len(candidates)}")
+            if stats.get('table_peak_rss'):
+                print(f"   - Pico de memória na extração de tabelas: {stats['table_peak_rss'] / 1024 / 1024:.1f} MB")
             print(f"   - Imagens extraídas: {stats['images']}")
             print(f"   - Entradas de fonte: {stats['font_info_entries']}")
             print(f"   - Tamanho texto bruto: {stats['raw_text_length']:,} chars")
@@ -86,12 +227,127 @@ Exemplos de uso:
             print(f"   - Linhas Markdown: {stats['markdown_lines']}")
             print(f"   - Método escolhido: {stats['method_chosen']}")
         
+        if args.verbose or args.profile:
+            print_step_metrics(pipeline.get_statistics()['step_metrics'])
+        
     except Exception as e:
         print(f"❌ Erro durante a conversão: {e}")
         if args.verbose:
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+
+def serve_main(argv) -> int:
+    """Subcomando 'serve': servidor de conversão com pipelines pré-carregados"""
+    import asyncio
+    from converter.server import ConversionServer
+    
+    parser = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Servidor local de conversão (POST /convert com o PDF ou {\"path\": ...})"
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta (padrão: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Porta TCP (padrão: 8765)')
+    parser.add_argument('--socket', help='Escutar em um socket Unix em vez de TCP')
+    parser.add_argument('--pool-size', type=int, help='Processos de conversão (padrão: número de CPUs)')
+    parser.add_argument('--queue-size', type=int, default=16,
+                        help='Requisições aguardando além das em execução antes de responder 503 (padrão: 16)')
+    parser.add_argument('-d', '--output-dir', default='output', help='Diretório de saída (padrão: output)')
+    parser.add_argument('--no-cache', action='store_true', help='Não usar o cache de conversões')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help='Diretório do cache de conversões')
+    parser.add_argument('--cache-size', type=int, default=2048, help='Tamanho máximo do cache em MB')
+    args = parser.parse_args(argv)
+    
+    server = ConversionServer(
+        args.output_dir,
+        pool_size=args.pool_size,
+        queue_size=args.queue_size,
+        cache=build_cache(args)
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        print("\n🛑 Servidor encerrado")
+    return 0
+
+
+def build_cache(args):
+    """Cria o cache de conversões conforme as opções da CLI"""
+    if args.no_cache:
+        return None
+    return ConversionCache(args.cache_dir, max_size=args.cache_size * 1024 * 1024)
+
+
+def run_batch(args) -> int:
+    """Converte vários PDFs e retorna o código de saída (1 se algum falhar)"""
+    if args.output:
+        print("Erro: --output não pode ser usado com diretórios ou padrões glob")
+        return 1
+    
+    pdf_files = find_pdfs(args.pdf_file)
+    if not pdf_files:
+        print(f"Erro: Nenhum PDF encontrado em: {args.pdf_file}")
+        return 1
+    
+    print(f"📚 Encontrados {len(pdf_files)} arquivos PDF para processar")
+    
+    results = convert_batch(
+        pdf_files,
+        args.output_dir,
+        jobs=args.jobs,
+        pages=args.pages,
+        from_step=args.from_step,
+        stream=args.stream,
+        workers=args.workers,
+        profile=args.profile,
+        cache=build_cache(args),
+        checkpoint_dir=args.checkpoint_dir,
+        concurrent_steps=args.concurrent_steps,
+        spill_threshold=args.spill_threshold * 1024 * 1024,
+        table_engine=args.table_engine,
+        table_page_rows=args.table_page_rows,
+        image_passthrough=not args.no_image_passthrough
+    )
+    
+    success_count = sum(1 for r in results if r['success'])
+    errors = [(Path(r['pdf']).name, r['error']) for r in results if not r['success']]
+    
+    # Relatório final
+    print(f"\n📊 RELATÓRIO FINAL")
+    print(f"✅ Sucessos: {success_count}")
+    print(f"❌ Erros: {len(errors)}")
+    print(f"📈 Taxa de sucesso: {(success_count / len(results) * 100):.1f}%")
+    
+    if errors:
+        print(f"\n❌ Erros encontrados:")
+        for pdf_name, error in errors:
+            print(f"  - {pdf_name}: {error}")
+        return 1
+    
+    return 0
+
+
+def print_step_metrics(step_metrics):
+    """Imprime a tabela de tempo e memória por passo do pipeline"""
+    if not step_metrics:
+        return
+    
+    print(f"\n⏱️  Desempenho por passo:")
+    print(f"   {'Passo':<28} {'Parede (s)':>11} {'CPU (s)':>9} {'Pico mem. (MB)':>15}")
+    for metrics in step_metrics:
+        if metrics['peak_memory'] is None:
+            peak = "-"
+        else:
+            peak = f"{metrics['peak_memory'] / 1024 / 1024:.1f}"
+        print(f"   {metrics['step']:<28} {metrics['wall_time']:>11.3f} {metrics['cpu_time']:>9.3f} {peak:>15}")
+    
+    total_wall = sum(m['wall_time'] for m in step_metrics)
+    total_cpu = sum(m['cpu_time'] for m in step_metrics)
+    print(f"   {'Total':<28} {total_wall:>11.3f} {total_cpu:>9.3f}")
 
 
 if __name__ == "__main__":
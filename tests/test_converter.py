@@ -1,5 +1,6 @@
 import pytest
 import os
+import pickle
 import tempfile
 from pathlib import Path
 
@@ -18,6 +19,58 @@ from converter.steps.text_extraction_step import TextExtractionStep
 from converter.steps.table_extraction_step import TableExtractionStep
 from converter.steps.cleanup_step import CleanupStep
 from converter.steps.image_extraction_step import ImageExtractionStep
+from converter.document_session import DocumentSession, parse_page_ranges, format_page_ranges
+from converter.batch import find_pdfs, convert_batch
+from converter.cache import ConversionCache
+from converter.span_store import SpanStore
+from converter.text_store import TextStore
+from converter.steps.preflight_step import PreflightStep
+from converter.steps.layout_step import LayoutStep
+from converter.steps.table_mask_step import TableMaskStep
+from converter.steps.markdown_conversion_step import MarkdownConversionStep
+from converter.layout import block_text
+from converter.font_profile import FontProfile
+from converter.table_renderer import iter_table_lines, write_table
+from converter.profiling import measure_step
+
+
+def _ocupar_cpu(segundos: float) -> int:
+    """Gasta CPU em um processo filho (usado no teste de métricas)"""
+    import time
+    fim = time.process_time() + segundos
+    voltas = 0
+    while time.process_time() < fim:
+        voltas += 1
+    return voltas
+
+
+async def _requisicao(socket_path: str, method: str, target: str, body: bytes = b"",
+                      content_type: str = "application/pdf", content_length: int = None):
+    """Faz uma requisição HTTP pelo socket Unix e devolve (status, cabeçalhos, corpo)"""
+    import asyncio
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body) if content_length is None else content_length}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    resposta = await reader.read()
+    writer.close()
+    
+    cabecalho, _, corpo = resposta.partition(b"\r\n\r\n")
+    linhas = cabecalho.decode('latin-1').split("\r\n")
+    headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(':') for l in linhas[1:])}
+    if headers.get('transfer-encoding') == 'chunked':
+        partes = b""
+        while True:
+            tamanho, _, corpo = corpo.partition(b"\r\n")
+            tamanho = int(tamanho, 16)
+            if not tamanho:
+                break
+            partes += corpo[:tamanho]
+            corpo = corpo[tamanho + 2:]
+        corpo = partes
+    return int(linhas[0].split()[1]), headers, corpo
 
 
 class TestPDFToMarkdownConverter:
@@ -106,6 +159,856 @@ class TestPDFToMarkdownConverter:
         with open(resultado, 'r', encoding='utf-8') as f:
             content = f.read()
             assert "Introdução" in content
+    
+    
+    def _criar_pdf(self, nome: str = "teste.pdf", paginas: int = 1) -> Path:
+        """Cria um PDF simples de teste com uma linha de título e uma de texto"""
+        import fitz
+        
+        pdf_path = self.output_dir / nome
+        doc = fitz.open()
+        for i in range(paginas):
+            page = doc.new_page()
+            page.insert_text((50, 50), f"Section {i + 1}", fontsize=16)
+            page.insert_text((50, 100), f"Body text of page {i + 1}.", fontsize=12)
+        doc.save(str(pdf_path))
+        doc.close()
+        return pdf_path
+    
+    def test_sessao_compartilhada_entre_passos(self):
+        """Os passos reutilizam o documento aberto na sessão"""
+        pdf_path = self._criar_pdf(paginas=2)
+        
+        with DocumentSession(str(pdf_path)) as session:
+            data = {'pdf_path': str(pdf_path), 'session': session}
+            data = TextExtractionStep().process(data)
+            data = ImageExtractionStep(str(self.output_dir)).process(data)
+            
+            assert data['session'] is session
+            assert data['total_pages'] == 2
+            # O dict de cada página foi obtido uma vez e ficou em cache
+            assert session.page_dict(0) is session.page_dict(0)
+        
+        assert session.closed
+    
+    def test_extracao_paralela_igual_a_serial(self):
+        """A extração em paralelo produz o mesmo resultado da serial"""
+        pdf_path = self._criar_pdf(paginas=5)
+        
+        serial = TextExtractionStep().process({'pdf_path': str(pdf_path)})
+        paralelo = TextExtractionStep(workers=3).process({'pdf_path': str(pdf_path)})
+        
+        assert paralelo['raw_text'] == serial['raw_text']
+        assert paralelo['font_info'] == serial['font_info']
+        assert paralelo['text_blocks'] == serial['text_blocks']
+        
+        serial['session'].close()
+        paralelo['session'].close()
+    
+    
+    def test_conversao_em_streaming(self):
+        """O modo streaming grava as páginas em ordem no arquivo de saída"""
+        pdf_path = self._criar_pdf(paginas=3)
+        
+        pipeline = ConversionPipeline(str(self.output_dir))
+        resultado = pipeline.convert_stream(str(pdf_path))
+        
+        content = resultado.read_text(encoding='utf-8')
+        posicoes = [content.index(f"Section {i}") for i in (1, 2, 3)]
+        assert posicoes == sorted(posicoes)
+        
+        stats = pipeline.get_statistics()
+        assert stats['total_pages'] == 3
+        assert stats['markdown_length'] == len(content)
+        
+        # Tabelas e imagens são contadas, mas não acumuladas entre páginas
+        import fitz
+        
+        pdf_path = self.output_dir / "tabelas_streaming.pdf"
+        doc = fitz.open()
+        for _ in range(2):
+            page = doc.new_page()
+            for linha in range(3):
+                page.draw_line((100, 200 + 20 * linha), (300, 200 + 20 * linha))
+            for x in (100, 200, 300):
+                page.draw_line((x, 200), (x, 240))
+            for linha, (a, b) in enumerate((("Name", "Qty"), ("alpha", "1"))):
+                page.insert_text((105, 215 + 20 * linha), a, fontsize=10)
+                page.insert_text((205, 215 + 20 * linha), b, fontsize=10)
+        doc.save(str(pdf_path))
+        doc.close()
+        pipeline.convert_stream(str(pdf_path))
+        assert pipeline.get_statistics()['tables'] == 2
+        assert 'tables' not in pipeline.current_data and 'images' not in pipeline.current_data
+    
+    
+    def test_metricas_por_passo(self):
+        """Cada passo registra tempo de parede, CPU e pico de memória"""
+        pdf_path = self._criar_pdf()
+        
+        pipeline = ConversionPipeline(str(self.output_dir), profile=True)
+        pipeline.convert(str(pdf_path))
+        
+        metrics = pipeline.get_statistics()['step_metrics']
+        assert [m['step'] for m in metrics] == [step.name for step in pipeline.steps]
+        for m in metrics:
+            assert m['wall_time'] >= 0 and m['cpu_time'] >= 0
+            assert m['peak_memory'] is not None
+        
+        # O tempo de CPU dos processos filhos do passo entra na métrica
+        from concurrent.futures import ProcessPoolExecutor
+        from converter.steps.base_step import BaseStep
+        
+        class PassoComProcessos(BaseStep):
+            def process(self, data):
+                with ProcessPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(_ocupar_cpu, [0.2, 0.2]))
+                return data
+        
+        _, metrics = measure_step(PassoComProcessos("Processos"), {})
+        assert metrics['cpu_time'] >= 0.3
+    
+    
+    def test_conversao_em_lote_com_processos(self, monkeypatch):
+        """O modo lote converte os PDFs em paralelo e reporta as falhas"""
+        pdf_dir = Path(self.temp_dir) / "pdfs"
+        pdf_dir.mkdir()
+        for nome in ("a.pdf", "b.pdf"):
+            (pdf_dir / nome).write_bytes(self._criar_pdf(nome).read_bytes())
+        (pdf_dir / "corrompido.pdf").write_text("não é um PDF")
+        
+        pdf_files = find_pdfs(str(pdf_dir))
+        results = convert_batch(pdf_files, str(self.output_dir / "lote"), jobs=2)
+        
+        assert [Path(r['pdf']).name for r in results] == ["a.pdf", "b.pdf", "corrompido.pdf"]
+        assert [r['success'] for r in results] == [True, True, False]
+        assert results[2]['error']
+        
+        # Em streaming cada documento é gravado página a página, sem passar por convert
+        def convert_indisponivel(*args, **kwargs):
+            raise AssertionError("convert não deveria ser chamado")
+        monkeypatch.setattr(ConversionPipeline, 'convert', convert_indisponivel)
+        results = convert_batch(pdf_files, str(self.output_dir / "lote_stream"), jobs=2, stream=True)
+        assert [r['success'] for r in results] == [True, True, False]
+        for result in results[:2]:
+            assert "Section 1" in Path(result['output']).read_text(encoding='utf-8')
+    
+    def test_imagens_de_documentos_do_lote_nao_colidem(self):
+        """Documentos convertidos no mesmo diretório mantêm cada um as suas imagens"""
+        import fitz
+        
+        pdf_dir = Path(self.temp_dir) / "pdfs"
+        pdf_dir.mkdir()
+        cores = {"a.pdf": (255, 0, 0), "b.pdf": (0, 0, 255)}
+        for nome, cor in cores.items():
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 10, 10), False)
+            pix.set_rect(pix.irect, cor)
+            doc = fitz.open()
+            page = doc.new_page()
+            page.insert_text((50, 50), "Figure", fontsize=12)
+            page.insert_image(fitz.Rect(50, 100, 150, 200), pixmap=pix)
+            doc.save(str(pdf_dir / nome))
+            doc.close()
+        
+        saida = self.output_dir / "lote"
+        results = convert_batch(find_pdfs(str(pdf_dir)), str(saida), jobs=2)
+        assert all(r['success'] for r in results)
+        
+        for nome, cor in cores.items():
+            stem = Path(nome).stem
+            content = (saida / f"{stem}.md").read_text(encoding='utf-8')
+            assert f"./images/{stem}_p1_1.png" in content
+            assert fitz.Pixmap(str(saida / "images" / f"{stem}_p1_1.png")).pixel(0, 0) == cor
+    
+    
+    def test_cache_de_conversao(self):
+        """Uma segunda conversão do mesmo PDF vem do cache"""
+        pdf_path = self._criar_pdf()
+        cache = ConversionCache(str(Path(self.temp_dir) / "cache"))
+        
+        pipeline = ConversionPipeline(str(self.output_dir), cache=cache)
+        primeiro = pipeline.convert(str(pdf_path)).read_text(encoding='utf-8')
+        assert not pipeline.get_statistics()['cache_hit']
+        
+        outra_saida = Path(self.temp_dir) / "outra_saida"
+        pipeline = ConversionPipeline(str(outra_saida), cache=cache)
+        resultado = pipeline.convert(str(pdf_path))
+        
+        assert pipeline.get_statistics()['cache_hit']
+        assert resultado.read_text(encoding='utf-8') == primeiro
+        
+        # Um limite de tamanho mínimo remove as entradas antigas
+        ConversionCache(str(Path(self.temp_dir) / "cache"), max_size=0).evict()
+        assert not list((Path(self.temp_dir) / "cache").glob("*/*/meta.json"))
+    
+    
+    def test_retomar_a_partir_de_checkpoint(self):
+        """Retomar de um passo usa o checkpoint e produz o mesmo Markdown"""
+        pdf_path = self._criar_pdf(paginas=2)
+        checkpoint_dir = str(Path(self.temp_dir) / "checkpoints")
+        
+        pipeline = ConversionPipeline(str(self.output_dir), checkpoint_dir=checkpoint_dir)
+        completo = pipeline.convert(str(pdf_path)).read_text(encoding='utf-8')
+        
+        retomado = pipeline.convert(str(pdf_path), from_step="MarkdownConversion")
+        metrics = pipeline.get_statistics()['step_metrics']
+        
+        assert retomado.read_text(encoding='utf-8') == completo
+        assert [m['step'] for m in metrics] == [
+            "MarkdownConversion", "AdvancedMarkdownConversion", "SpellChecking"
+        ]
+        
+        sem_checkpoint = ConversionPipeline(
+            str(self.output_dir), checkpoint_dir=str(Path(self.temp_dir) / "vazio")
+        )
+        with pytest.raises(ValueError):
+            sem_checkpoint.convert(str(pdf_path), from_step="MarkdownConversion")
+        
+        # O modo lote também retoma cada documento do seu checkpoint
+        for destino, sucesso in ((checkpoint_dir, True), (str(Path(self.temp_dir) / "vazio"), False)):
+            results = convert_batch([pdf_path], str(self.output_dir / "lote"),
+                                    from_step="MarkdownConversion", checkpoint_dir=destino)
+            assert results[0]['success'] == sucesso
+        assert Path(results[0]['pdf']) == pdf_path
+        assert (self.output_dir / "lote" / f"{pdf_path.stem}.md").read_text(encoding='utf-8') == completo
+    
+    
+    def test_passos_concorrentes_igual_a_sequencial(self):
+        """O escalonador por dependências produz o mesmo Markdown da execução linear"""
+        pdf_path = self._criar_pdf(paginas=3)
+        
+        sequencial = ConversionPipeline(str(self.output_dir))
+        esperado = sequencial.convert(str(pdf_path), "sequencial.md").read_text(encoding='utf-8')
+        
+        concorrente = ConversionPipeline(str(self.output_dir), concurrent_steps=True)
+        deps = concorrente.scheduler.dependencies()
+        # Tabelas e imagens dependem só da triagem, não da extração de texto
+        assert deps[2] == {0} and deps[5] == {0}
+        
+        resultado = concorrente.convert(str(pdf_path), "concorrente.md")
+        assert resultado.read_text(encoding='utf-8') == esperado
+        assert len(concorrente.get_statistics()['step_metrics']) == len(concorrente.steps)
+    
+    
+    def test_tabela_colunar_de_spans(self):
+        """Os spans ficam em colunas compactas e continuam acessíveis como dicts"""
+        pdf_path = self._criar_pdf(paginas=2)
+        data = TextExtractionStep().process({'pdf_path': str(pdf_path)})
+        data['session'].close()
+        
+        spans = data['font_info']
+        assert isinstance(spans, SpanStore)
+        assert len(spans) == 4
+        assert spans.fonts == [spans.font(0)]  # Nome da fonte internado uma única vez
+        assert spans[0]['text'] == "Section 1"
+        assert spans[0]['tamanho'] == 16 and spans[0]['pagina'] == 1
+        assert list(data['text_blocks']) == [info['text'] for info in spans]
+        
+        # Sobrevive ao pickle (checkpoints e processos) e à junção de faixas
+        restaurado = pickle.loads(pickle.dumps(spans))
+        assert restaurado == spans
+        juntos = spans.select(range(2))
+        juntos.extend(spans.select(range(2, 4)))
+        assert juntos == spans
+    
+    
+    def test_extracao_em_passagem_unica(self):
+        """O texto bruto sai do mesmo percurso dos spans e equivale a get_text()"""
+        pdf_path = self._criar_pdf(paginas=2)
+        
+        with DocumentSession(str(pdf_path)) as session:
+            esperado = [session.page(n).get_text() for n in range(session.page_count)]
+            spans = SpanStore()
+            textos = [TextExtractionStep.extract_page(session, n, spans) for n in range(session.page_count)]
+            
+            assert textos == esperado
+            assert len(spans) == 4
+            # O dict da página é pedido só com texto, sem blocos de imagem
+            assert all(block['type'] == 0 for block in session.page_dict(0)['blocks'])
+            
+            # O passo libera o dict e a página de cada página já extraída
+            TextExtractionStep().process({'pdf_path': str(pdf_path), 'session': session})
+            assert not session._page_dicts and not session._pages
+    
+    
+    def test_texto_transborda_para_disco(self):
+        """Acima do limite o texto vai para um arquivo mapeado em memória sem mudar o conteúdo"""
+        texto = TextStore(spill_threshold=10)
+        texto.write("ação e reação\n")
+        texto.write("segunda linha")
+        
+        assert texto.spilled
+        assert len(texto) == len("ação e reação\nsegunda linha")
+        assert texto == "ação e reação\nsegunda linha"
+        # Blocos pequenos cortam caracteres UTF-8 ao meio sem corromper o texto
+        assert ''.join(texto.iter_chunks(chunk_size=3)) == texto.getvalue()
+        assert list(texto) == ["ação e reação\n", "segunda linha"]
+        assert pickle.loads(pickle.dumps(texto)) == texto
+        texto.close()
+        
+        pdf_path = self._criar_pdf(paginas=3)
+        esperado = ConversionPipeline(str(self.output_dir)).convert(str(pdf_path), "memoria.md")
+        pipeline = ConversionPipeline(str(self.output_dir), spill_threshold=16)
+        resultado = pipeline.convert(str(pdf_path), "disco.md")
+        
+        assert pipeline.current_data['raw_text'].spilled
+        assert pipeline.current_data['cleaned_text'].spilled
+        assert resultado.read_text(encoding='utf-8') == esperado.read_text(encoding='utf-8')
+    
+    
+    def test_selecao_de_paginas(self):
+        """Apenas as páginas selecionadas são extraídas e convertidas"""
+        pdf_path = self._criar_pdf(paginas=5)
+        
+        with DocumentSession(str(pdf_path), "2,4-") as session:
+            assert session.page_numbers == [1, 3, 4]
+            assert [page.page_number for page in session.plumber.pages] == [2, 4, 5]
+        with pytest.raises(ValueError):
+            DocumentSession(str(pdf_path), "3-1")
+        # Uma seleção fora do documento é um erro, não um Markdown vazio
+        with pytest.raises(ValueError, match="tem 5 páginas"):
+            ConversionPipeline(str(self.output_dir)).convert(str(pdf_path), "vazio.md", pages="50-60")
+        assert not (self.output_dir / "vazio.md").exists()
+        
+        pipeline = ConversionPipeline(str(self.output_dir))
+        markdown = pipeline.convert(str(pdf_path), "paginas.md", pages="2,4-").read_text(encoding='utf-8')
+        assert "Section 2" in markdown and "Section 5" in markdown
+        assert "Section 1" not in markdown and "Section 3" not in markdown
+        assert pipeline.get_statistics()['total_pages'] == 3
+        assert {span['pagina'] for span in pipeline.current_data['font_info']} == {2, 4, 5}
+        
+        # Passos em outros processos respeitam a mesma seleção
+        concorrente = ConversionPipeline(str(self.output_dir), concurrent_steps=True)
+        resultado = concorrente.convert(str(pdf_path), "paginas_concorrente.md", pages=[2, 4, 5])
+        assert resultado.read_text(encoding='utf-8') == markdown
+        
+        # Seleções equivalentes compartilham a chave de cache
+        for equivalente in ("1,2", "2,1", "1-2,2", "2-2,1-1"):
+            assert format_page_ranges(parse_page_ranges(equivalente)) == "1-2"
+        assert format_page_ranges(parse_page_ranges("4-,1,2-3,6")) == "1-"
+        assert format_page_ranges(parse_page_ranges("5,1,3")) == "1,3,5"
+        assert ConversionPipeline._input_hash(pdf_path, parse_page_ranges("4-5,2")) == \
+            ConversionPipeline._input_hash(pdf_path, parse_page_ranges([5, 4, 2]))
+    
+    
+    def test_triagem_previa_das_paginas(self):
+        """A triagem classifica as páginas e os passos pulam as que não têm o que extrair"""
+        import fitz
+        
+        pdf_path = self.output_dir / "triagem.pdf"
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Texto", fontsize=12)
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 20, 20), False)
+        pix.clear_with(128)
+        digitalizada = doc.new_page()
+        digitalizada.insert_image(digitalizada.rect, pixmap=pix)
+        doc.new_page()
+        vetorial = doc.new_page()
+        vetorial.insert_text((50, 50), "Mapa", fontsize=12)
+        for y in range(20):
+            vetorial.draw_line((10, 100 + y), (500, 100 + y))
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        data = PreflightStep(vector_threshold=10).process({'pdf_path': str(pdf_path)})
+        tipos = [info['tipo'] for info in data['page_triage'].values()]
+        assert tipos == ["text", "image-only", "blank", "vector-heavy"]
+        assert data['page_triage'][1]['cobertura_imagem'] == pytest.approx(1.0)
+        
+        data = TextExtractionStep().process(data)
+        data = ImageExtractionStep(str(self.output_dir)).process(data)
+        data['session'].close()
+        assert {span['pagina'] for span in data['font_info']} == {1, 4}
+        assert [image['pagina'] for image in data['images']] == [2]
+    
+    
+    def test_layout_agrupa_spans_em_blocos(self):
+        """Spans da mesma linha e linhas do mesmo parágrafo viram um único bloco"""
+        import fitz
+        
+        pdf_path = self.output_dir / "layout.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "Results", fontsize=16)
+        # Uma linha com dois estilos (dois spans) e um parágrafo quebrado em várias linhas
+        page.insert_text((50, 90), "Bold start", fontsize=11, fontname="hebo")
+        page.insert_text((110, 90), "and regular end.", fontsize=11)
+        page.insert_textbox(fitz.Rect(50, 120, 250, 300), "word " * 60, fontsize=11)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        data = TextExtractionStep().process({'pdf_path': str(pdf_path)})
+        data['session'].close()
+        data = LayoutStep().process(data)
+        
+        blocos = [block_text(data['font_info'], block) for block in data['layout']]
+        assert blocos[:2] == ["Results", "Bold start and regular end."]
+        assert blocos[2] == ' '.join(["word"] * 60)
+        assert len(data['layout']) == 3
+        assert len(data['layout'][2]['linhas']) > 3
+        
+        markdown = MarkdownConversionStep()._process_font_info(data['font_info'], data['layout'])
+        assert markdown.split('\n\n')[:2] == ["# Results", "Bold start and regular end."]
+        assert markdown.count('\n\n') == 2
+    
+    
+    def test_ordem_de_leitura_em_duas_colunas(self):
+        """Em páginas com duas colunas, a coluna da esquerda é lida inteira antes da direita"""
+        import fitz
+        
+        pdf_path = self.output_dir / "colunas.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "A two column article title", fontsize=16)
+        for x, coluna in ((50, "left"), (310, "right")):
+            for y, paragrafo in ((80, "one"), (200, "two")):
+                texto = f"{coluna} {paragrafo} " * 12
+                page.insert_textbox(fitz.Rect(x, y, x + 240, y + 100), texto, fontsize=10)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        data = TextExtractionStep().process({'pdf_path': str(pdf_path)})
+        data['session'].close()
+        data = LayoutStep().process(data)
+        
+        primeiras = [block_text(data['font_info'], block).split()[:2] for block in data['layout']]
+        assert primeiras == [
+            ["A", "two"], ["left", "one"], ["left", "two"], ["right", "one"], ["right", "two"]
+        ]
+        assert [block['coluna'] for block in data['layout']][1:] == [0, 0, 1, 1]
+    
+    
+    def test_cabecalhos_e_rodapes_repetidos(self):
+        """Linhas que se repetem no topo ou na base de muitas páginas são descartadas"""
+        import fitz
+        
+        pdf_path = self.output_dir / "periodico.pdf"
+        doc = fitz.open()
+        for i in range(4):
+            page = doc.new_page()
+            page.insert_text((50, 40), "Journal of Testing, vol. 12", fontsize=9)
+            page.insert_text((50, 100), f"Section {i + 1}", fontsize=16)
+            for linha in range(3):
+                page.insert_text((50, 140 + 20 * linha), f"Body line {linha} of part {i + 1}.", fontsize=11)
+            page.insert_text((290, 800), f"Page {i + 1} of 4", fontsize=9)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        data = TextExtractionStep().process({'pdf_path': str(pdf_path)})
+        data['session'].close()
+        data = CleanupStep().process(data)
+        
+        assert data['running_lines'] == ["journal of testing, vol. #", "page # of #"]
+        textos = list(data['text_blocks'])
+        assert not any("Journal" in texto or "of 4" in texto for texto in textos)
+        assert "Section 3" in textos and "Body line 2 of part 4." in textos
+        assert {span['pagina'] for span in data['font_info']} == {1, 2, 3, 4}
+        
+        markdown = ConversionPipeline(str(self.output_dir)).convert(str(pdf_path), "periodico.md").read_text(encoding='utf-8')
+        assert "Journal of Testing" not in markdown and "Body line 0 of part 1." in markdown
+    
+    
+    def test_pre_filtro_de_paginas_com_tabelas(self):
+        """Só páginas com bordas desenhadas vão para o pdfplumber, recortadas à região da tabela"""
+        import fitz
+        
+        pdf_path = self.output_dir / "tabela.pdf"
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Only prose on this page.", fontsize=11)
+        page = doc.new_page()
+        page.insert_text((50, 50), "A table follows.", fontsize=11)
+        page.draw_line((50, 700), (300, 700))  # Traço solto, longe da tabela
+        for linha in range(3):
+            page.draw_line((100, 200 + 20 * linha), (300, 200 + 20 * linha))
+        for x in (100, 200, 300):
+            page.draw_line((x, 200), (x, 240))
+        for linha, (a, b) in enumerate((("Name", "Value"), ("alpha", "1"))):
+            page.insert_text((105, 215 + 20 * linha), a, fontsize=10)
+            page.insert_text((205, 215 + 20 * linha), b, fontsize=10)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        data = TableExtractionStep().process({'pdf_path': str(pdf_path)})
+        candidatas = data['table_candidates']
+        plumber_page = data['session'].plumber.pages[1]
+        esperado = plumber_page.extract_tables()
+        data['session'].close()
+        
+        assert not candidatas[0]['candidata']
+        assert candidatas[1]['candidata'] and candidatas[1]['tabelas'] == 1
+        assert [tuple(round(v) for v in bbox) for bbox in candidatas[1]['regioes']] == [(98, 198, 302, 242)]
+        assert [table['dados'] for table in data['tables']] == esperado == [[["Name", "Value"], ["alpha", "1"]]]
+        
+        pipeline = ConversionPipeline(str(self.output_dir))
+        pipeline.convert(str(pdf_path), "tabela.md")
+        assert [info['candidata'] for info in pipeline.get_statistics()['table_candidates']] == [False, True]
+    
+    
+    def test_tabela_densamente_pautada(self, monkeypatch):
+        """Páginas vetoriais (ex.: balanços pautados) continuam na detecção de tabelas"""
+        import fitz
+        import converter.steps.table_extraction_step as table_extraction
+        
+        pdf_path = self.output_dir / "balanco.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 40), "Balance sheet", fontsize=12)
+        linhas = 35
+        for linha in range(linhas + 1):
+            page.draw_line((50, 60 + 20 * linha), (450, 60 + 20 * linha))
+        for x in (50, 250, 450):
+            page.draw_line((x, 60), (x, 60 + 20 * linhas))
+        for linha in range(linhas):
+            page.insert_text((55, 75 + 20 * linha), f"Account {linha}", fontsize=10)
+            page.insert_text((255, 75 + 20 * linha), str(linha * 100), fontsize=10)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        data = PreflightStep(vector_threshold=30).process({'pdf_path': str(pdf_path)})
+        assert data['page_triage'][0]['tipo'] == "vector-heavy"
+        agrupado = TableExtractionStep().process(data)['tables']
+        assert len(agrupado) == 1 and len(agrupado[0]['dados']) == linhas
+        assert agrupado[0]['dados'][-1] == [f"Account {linhas - 1}", str((linhas - 1) * 100)]
+        
+        # Com bordas demais o agrupamento é pulado, com o mesmo resultado
+        monkeypatch.setattr(table_extraction, 'MAX_CLUSTER_EDGES', 10)
+        data = TableExtractionStep().process(data)
+        data['session'].close()
+        assert [table['dados'] for table in data['tables']] == [agrupado[0]['dados']]
+        assert data['tables'][0]['bbox'] is not None
+    
+    
+    def test_tabelas_em_paralelo_iguais_ao_serial(self):
+        """A extração de tabelas em vários processos produz o mesmo resultado, na mesma ordem"""
+        import fitz
+        
+        pdf_path = self.output_dir / "relatorio.pdf"
+        doc = fitz.open()
+        for i in range(5):
+            page = doc.new_page()
+            page.insert_text((50, 50), f"Report page {i + 1}", fontsize=11)
+            if i == 2:
+                continue  # Uma página sem tabela no meio
+            for top in (100, 300):
+                for linha in range(3):
+                    page.draw_line((100, top + 20 * linha), (300, top + 20 * linha))
+                for x in (100, 200, 300):
+                    page.draw_line((x, top), (x, top + 40))
+                page.insert_text((105, top + 15), f"p{i + 1}", fontsize=10)
+                page.insert_text((205, top + 35), f"t{top}", fontsize=10)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        serial = TableExtractionStep().process({'pdf_path': str(pdf_path)})
+        # Cada página do pdfplumber é liberada depois de extraída
+        assert not any(hasattr(page, '_layout') or hasattr(page, '_objects') for page in serial['session'].plumber.pages)
+        serial['session'].close()
+        paralelo = TableExtractionStep(workers=3).process({'pdf_path': str(pdf_path)})
+        paralelo['session'].close()
+        
+        def decisoes(data):
+            # A memória medida em cada página varia entre execuções
+            return {n: dict(info, memoria_rss=None) for n, info in data['table_candidates'].items()}
+        
+        assert paralelo['tables'] == serial['tables']
+        assert decisoes(paralelo) == decisoes(serial)
+        assert all(info['memoria_rss'] for info in paralelo['table_candidates'].values())
+        assert [(table['pagina'], table['numero']) for table in paralelo['tables']] == [
+            (1, 1), (1, 2), (2, 1), (2, 2), (4, 1), (4, 2), (5, 1), (5, 2)
+        ]
+    
+    
+    def test_mecanismo_de_tabelas_pymupdf(self):
+        """O mecanismo PyMuPDF encontra as mesmas células que o pdfplumber"""
+        import fitz
+        
+        pdf_path = self.output_dir / "mecanismos.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        for linha in range(4):
+            page.draw_line((100, 200 + 20 * linha), (400, 200 + 20 * linha))
+        for x in (100, 200, 300, 400):
+            page.draw_line((x, 200), (x, 260))
+        for linha in range(3):
+            for coluna in range(3):
+                page.insert_text((105 + 100 * coluna, 215 + 20 * linha), f"c{linha}{coluna}", fontsize=10)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        resultados = {}
+        for engine in ("pdfplumber", "pymupdf"):
+            data = TableExtractionStep(engine=engine).process({'pdf_path': str(pdf_path)})
+            data['session'].close()
+            resultados[engine] = [table['dados'] for table in data['tables']]
+        
+        assert resultados["pymupdf"] == resultados["pdfplumber"]
+        assert resultados["pymupdf"][0][2] == ["c20", "c21", "c22"]
+        assert TableExtractionStep(engine="pymupdf").fingerprint() != TableExtractionStep().fingerprint()
+        with pytest.raises(ValueError):
+            TableExtractionStep(engine="camelot")
+        
+        # Um mecanismo sem extract falha ao ser criado, não no meio do documento
+        from converter.table_backends import TableBackend
+        
+        class MecanismoIncompleto(TableBackend):
+            name = "incompleto"
+        
+        with pytest.raises(TypeError):
+            MecanismoIncompleto()
+    
+    
+    def test_texto_das_tabelas_aparece_uma_vez(self):
+        """Os spans dentro de uma tabela saem do texto corrido e ficam só nas células"""
+        import fitz
+        
+        pdf_path = self.output_dir / "mascara.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "Quarterly results are shown below.", fontsize=11)
+        for linha in range(3):
+            page.draw_line((100, 200 + 20 * linha), (300, 200 + 20 * linha))
+        for x in (100, 200, 300):
+            page.draw_line((x, 200), (x, 240))
+        page.insert_text((105, 215), "Revenue", fontsize=10)
+        page.insert_text((205, 215), "Qty", fontsize=10)
+        page.insert_text((105, 235), "alpha", fontsize=10)
+        page.insert_text((205, 235), "42", fontsize=10)
+        page.insert_text((50, 300), "Text after the table.", fontsize=11)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        pipeline = ConversionPipeline(str(self.output_dir))
+        markdown = pipeline.convert(str(pdf_path), "mascara.md").read_text(encoding='utf-8')
+        textos = list(pipeline.current_data['text_blocks'])
+        assert "alpha" not in textos and "Revenue" not in textos
+        assert "Text after the table." in textos
+        assert "alpha" not in str(pipeline.current_data['raw_text'])
+        assert markdown.count("alpha") == 1 and markdown.count("Revenue") == 1
+        
+        streaming = pipeline.convert_stream(str(pdf_path), "mascara_stream.md").read_text(encoding='utf-8')
+        assert streaming.count("alpha") == 1 and "Text after the table." in streaming
+        
+        # Em página girada só o PyMuPDF tem as bboxes nas coordenadas dos spans
+        doc = fitz.open(str(pdf_path))
+        doc[0].set_rotation(90)
+        girada = self.output_dir / "mascara_girada.pdf"
+        doc.save(str(girada))
+        doc.close()
+        bboxes = {}
+        for engine in ("pdfplumber", "pymupdf"):
+            pipeline = ConversionPipeline(str(self.output_dir), table_engine=engine)
+            markdown = pipeline.convert(str(girada), f"girada_{engine}.md").read_text(encoding='utf-8')
+            bboxes[engine] = [table['bbox'] for table in pipeline.current_data['tables']]
+            if engine == "pymupdf":
+                assert markdown.count("alpha") == 1 and "Text after the table." in markdown
+        assert bboxes["pdfplumber"] == [None]
+        assert bboxes["pymupdf"] == [pytest.approx((100, 200, 300, 240))]
+        
+        # Páginas sem tabela mantêm o texto da extração, inclusive as fontes pequenas
+        doc = fitz.open(str(pdf_path))
+        outra = doc.new_page()
+        outra.insert_text((50, 50), "A page without tables.", fontsize=11)
+        for i in range(3):
+            outra.insert_text((50, 80 + 10 * i), f"tiny {i}", fontsize=5)
+        duas_paginas = self.output_dir / "mascara_duas.pdf"
+        doc.save(str(duas_paginas))
+        doc.close()
+        
+        data = TextExtractionStep().process({'pdf_path': str(duas_paginas)})
+        original = dict(TableMaskStep.page_segments(data['raw_text'], data['raw_text_pages']))
+        data = TableMaskStep().process(TableExtractionStep().process(data))
+        data['session'].close()
+        mascarado = dict(TableMaskStep.page_segments(data['raw_text'], data['raw_text_pages']))
+        assert mascarado[2] == original[2] and "tiny 2" in mascarado[2]
+        assert "alpha" in original[1] and "alpha" not in mascarado[1]
+    
+    
+    def test_renderizacao_de_tabelas_em_fluxo(self):
+        """Tabelas são geradas linha a linha, normalizando células e linhas irregulares"""
+        import io
+        
+        tabela = [["A", None, "C"], ["1", "x|y"], ["2", "duas\nlinhas", "3", "extra"]]
+        assert converter_tabela(tabela) == (
+            "| A |  | C |\n|---|---|---|\n| 1 | x\\|y |  |\n| 2 | duas linhas | 3 extra |"
+        )
+        
+        # Gerador de linhas: a tabela não precisa estar inteira na memória
+        linhas = (["col", str(i)] for i in range(10))
+        assert list(iter_table_lines(linhas, max_rows=3))[-2:] == ["", "*... 6 linhas omitidas*"]
+        
+        paginada = list(iter_table_lines([["h"]] + [[str(i)] for i in range(5)], page_rows=2))
+        assert paginada.count("| h |") == 3 and paginada[-1] == "| 4 |"
+        
+        saida = io.StringIO()
+        write_table(tabela, saida)
+        assert saida.getvalue() == converter_tabela(tabela)
+    
+    
+    def test_imagens_gravadas_sem_recodificar(self):
+        """Imagens JPEG são gravadas com o fluxo original; as demais viram PNG"""
+        import io
+        import fitz
+        from PIL import Image
+        
+        jpeg = io.BytesIO()
+        Image.new("RGB", (40, 30), (200, 80, 20)).save(jpeg, format="JPEG")
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 20, 20), False)
+        pix.clear_with(128)
+        
+        pdf_path = self.output_dir / "imagens.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(50, 50, 250, 200), stream=jpeg.getvalue())
+        page.insert_image(fitz.Rect(50, 300, 150, 400), pixmap=pix)
+        doc.save(str(pdf_path))
+        doc.close()
+        
+        with DocumentSession(str(pdf_path)) as session:
+            data = {'pdf_path': str(pdf_path), 'session': session}
+            images = ImageExtractionStep(str(self.output_dir)).process(data)['images']
+            assert [Path(image['caminho']).suffix for image in images] == [".jpg", ".png"]
+            assert Path(images[0]['caminho']).read_bytes() == jpeg.getvalue()
+            
+            recodificadas = ImageExtractionStep(str(self.output_dir / "png"), passthrough=False)
+            images = recodificadas.extract_page_images(session, 0)
+            assert [Path(image['caminho']).suffix for image in images] == [".png", ".png"]
+            assert Image.open(images[0]['caminho']).size == (40, 30)
+        
+        assert ImageExtractionStep(str(self.output_dir)).fingerprint() != recodificadas.fingerprint()
+    
+    
+    def test_servidor_de_conversao(self, monkeypatch):
+        """O servidor converte uploads e caminhos, aplica os limites e fecha os pipelines"""
+        import asyncio
+        import json
+        import converter.server
+        from converter.server import ConversionServer
+        
+        # Os processos do pool herdam o método (fork) e marcam o fechamento do pipeline
+        fechados = Path(self.temp_dir) / "fechados"
+        fechados.mkdir()
+        monkeypatch.setattr(
+            ConversionPipeline, 'close',
+            lambda pipeline: (fechados / str(os.getpid())).touch()
+        )
+        # Blocos pequenos para o Markdown ser enviado em várias partes
+        monkeypatch.setattr(converter.server, 'STREAM_CHUNK_SIZE', 500)
+        
+        pdf_path = self._criar_pdf(paginas=2)
+        grande = self.output_dir / "grande.pdf"
+        import fitz
+        doc = fitz.open()
+        for i in range(3):
+            page = doc.new_page()
+            for linha in range(20):
+                page.insert_text((50, 50 + linha * 18), f"Line {linha} of page {i} with \"quotes\" and text", fontsize=11)
+        doc.save(str(grande))
+        doc.close()
+        
+        # Dois PDFs diferentes com o mesmo nome, cada um com uma imagem
+        homonimos = []
+        for pasta in ("a", "b"):
+            (Path(self.temp_dir) / pasta).mkdir()
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 10, 10), False)
+            pix.clear_with(40 if pasta == "a" else 200)
+            doc = fitz.open()
+            page = doc.new_page()
+            page.insert_text((50, 50), f"Document from folder {pasta}", fontsize=12)
+            page.insert_image(fitz.Rect(50, 100, 150, 200), pixmap=pix)
+            homonimos.append(Path(self.temp_dir) / pasta / "doc.pdf")
+            doc.save(str(homonimos[-1]))
+            doc.close()
+        
+        saida = self.output_dir / "servidor"
+        socket_path = str(Path(self.temp_dir) / "servidor.sock")
+        server = ConversionServer(str(saida), pool_size=2, queue_size=0, max_upload_size=1024 * 1024)
+        
+        async def cenario():
+            tarefa = asyncio.create_task(server.serve(socket_path=socket_path))
+            while not os.path.exists(socket_path):
+                await asyncio.sleep(0.05)
+            try:
+                status, _, corpo = await _requisicao(socket_path, "GET", "/health")
+                assert status == 200 and json.loads(corpo)['pool_size'] == 2
+                assert (await _requisicao(socket_path, "GET", "/outra"))[0] == 404
+                assert (await _requisicao(socket_path, "GET", "/convert"))[0] == 405
+                
+                # Upload: Markdown e estatísticas chegam em blocos
+                status, headers, corpo = await _requisicao(
+                    socket_path, "POST", "/convert?name=enviado.md", pdf_path.read_bytes()
+                )
+                resultado = json.loads(corpo)
+                assert status == 200 and headers['transfer-encoding'] == 'chunked'
+                assert "Section 2" in resultado['markdown']
+                assert resultado['stats']['total_pages'] == 2
+                
+                # Caminho acessível pelo servidor, com Markdown maior que um bloco
+                status, _, corpo = await _requisicao(
+                    socket_path, "POST", "/convert",
+                    json.dumps({'path': str(grande)}).encode(), "application/json"
+                )
+                resultado = json.loads(corpo)
+                assert status == 200
+                assert len(resultado['markdown']) > 2 * converter.server.STREAM_CHUNK_SIZE
+                assert 'Line 18 of page 2 with "quotes"' in resultado['markdown']
+                
+                # Requisições simultâneas com o mesmo nome não trocam Markdown nem imagens
+                respostas = await asyncio.gather(*(
+                    _requisicao(socket_path, "POST", "/convert?name=igual.md",
+                                json.dumps({'path': str(caminho)}).encode(), "application/json")
+                    for caminho in homonimos
+                ))
+                resultados = [json.loads(corpo) for _, _, corpo in respostas]
+                assert "folder a" in resultados[0]['markdown'] and "folder b" in resultados[1]['markdown']
+                assert resultados[0]['output'] != resultados[1]['output']
+                assert resultados[0]['markdown'] != resultados[1]['markdown']
+                # Depois da resposta nada fica no diretório de saída
+                assert not list(saida.glob("*.md")) and not list((saida / "images").iterdir())
+                
+                # Recusado pelo Content-Length, antes de o corpo ser enviado
+                status, _, _ = await _requisicao(socket_path, "POST", "/convert", content_length=2 * 1024 * 1024)
+                assert status == 413
+                for invalido in ("abc", -5):
+                    status, _, _ = await _requisicao(socket_path, "POST", "/convert", content_length=invalido)
+                    assert status == 400
+                
+                # Com as requisições em andamento (corpo ainda não enviado) a fila está cheia
+                paradas = []
+                for _ in range(2):
+                    _, parada = await asyncio.open_unix_connection(socket_path)
+                    parada.write(b"POST /convert HTTP/1.1\r\nContent-Length: 100\r\n\r\n")
+                    await parada.drain()
+                    paradas.append(parada)
+                await asyncio.sleep(0.2)
+                status, headers, _ = await _requisicao(socket_path, "POST", "/convert", pdf_path.read_bytes())
+                assert status == 503 and headers['retry-after'] == "1"
+                for parada in paradas:
+                    parada.close()
+            finally:
+                tarefa.cancel()
+                try:
+                    await tarefa
+                except asyncio.CancelledError:
+                    pass
+        
+        asyncio.run(cenario())
+        assert len(list(fechados.iterdir())) == 2
+    
+    
+    def test_perfil_de_fontes_define_niveis_de_titulo(self):
+        """O corpo é o tamanho com mais caracteres e os maiores viram níveis de título"""
+        perfil = FontProfile.from_sizes([
+            (10, 1000), (11, 100), (14, 50), (18, 20), (17.6, 10), (10.1, 300)
+        ])
+        
+        assert perfil.body_size == 10
+        assert perfil.heading_level(11) == 0  # Pouco maior que o corpo não é título
+        assert perfil.heading_level(18.1) == 1 and perfil.heading_level(17.5) == 1
+        assert perfil.heading_prefix(14) == "## "
+        assert perfil.heading_prefix(10) == ""
+        
+        # Um documento todo em 16pt não tem títulos
+        assert detectar_titulos([{"texto": "Só corpo", "tamanho": 16}]) == "Só corpo"
 
 
 if __name__ == "__main__":